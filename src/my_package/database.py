@@ -1,21 +1,154 @@
 import sqlite3
-import json
 import datetime
-from typing import List, Dict, Any, Optional
-import pandas as pd
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Iterator, Optional, Tuple
 import numpy as np
 from pathlib import Path
+import orjson
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Optional: connectorx liest SQLite direkt in Arrow-Spalten statt Zeile für Zeile
+try:
+    import connectorx as cx
+    CONNECTORX_AVAILABLE = True
+except ImportError:
+    CONNECTORX_AVAILABLE = False
+
+# Streamlit bedient Sessions mit bis zu 8 Script-Threads
+POOL_SIZE = 8
+
+# Die 30-Tage-Kostenanalyse ist minutenweise stabil
+COST_ANALYSIS_TTL = 60
+
+# Bei jeder Schemaänderung in init_database erhöhen
+SCHEMA_VERSION = 4
+
+# Vitalparameter als typisierte Spalten (zusätzlich zur JSON-Spalte vital_signs)
+VITAL_SIGN_COLUMNS = {
+    "systolic_bp": "INTEGER",
+    "diastolic_bp": "INTEGER",
+    "heart_rate": "INTEGER",
+    "temperature": "REAL",
+    "respiratory_rate": "INTEGER",
+    "oxygen_saturation": "INTEGER",
+}
+
+
+# Feste SQL-Texte, damit SQLites Statement-Cache je Pool-Verbindung greift
+_INSERT_ORDER_SQL = """
+    INSERT INTO laboratory_orders (
+        patient_age, patient_gender, mts_category, diagnosis,
+        comorbidities, vital_signs, symptom_duration, pain_scale,
+        additional_notes, laboratory_values, reasoning,
+        estimated_duration, urgency_level, cost_efficiency,
+        quality_check, session_id,
+        systolic_bp, diastolic_bp, heart_rate, temperature,
+        respiratory_rate, oxygen_saturation
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_RESULT_SQL = """
+    INSERT INTO laboratory_results (
+        order_id, parameter_name, value, unit,
+        reference_min, reference_max, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
 
 class CliniqDatabase:
     """Database management for Cliniq laboratory orders and analysis."""
     
-    def __init__(self, db_path: str = "cliniq_data.db"):
+    def __init__(self, db_path: str = "cliniq_data.db", pool_size: int = POOL_SIZE):
         self.db_path = db_path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        self._cost_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+        # Schreibgeneration: ein vor dem Schreiben begonnenes Ergebnis wird nicht mehr gecacht
+        self._cost_generation = 0
+        self._cost_lock = threading.Lock()
         self.init_database()
     
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a long-lived connection for the pool."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-65536")
+        return conn
+    
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """Check a pooled connection out for the duration of the block.
+        
+        Connections are opened lazily; surplus ones beyond the pool size are
+        closed on return. Connections run in autocommit mode, so writes go
+        through ``_transaction``. A connection that comes back inside an open
+        transaction is rolled back first, or discarded if that fails.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_connection()
+        
+        try:
+            yield conn
+        finally:
+            # Nie eine offene Transaktion an den nächsten Ausleiher weiterreichen
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    conn.close()
+                    conn = None
+            if conn is not None:
+                try:
+                    self._pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+    
+    @contextmanager
+    def _transaction(self, conn: Optional[sqlite3.Connection] = None) -> Iterator[sqlite3.Connection]:
+        """Run the block in one transaction on a pooled connection.
+        
+        With a caller-provided ``conn`` (e.g. from ``bulk_load``), the caller owns the transaction.
+        """
+        if conn is not None:
+            yield conn
+            return
+        
+        with self._conn() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                # Auch bei KeyboardInterrupt oder fehlgeschlagenem COMMIT (SQLITE_BUSY)
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+    
+    def close(self):
+        """Close all idle pooled connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
     def init_database(self):
-        """Initialize database with required tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Initialize database with required tables.
+        
+        Skipped when the file's ``user_version`` already matches ``SCHEMA_VERSION``.
+        """
+        with self._conn() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+                return
+        
+        with self._transaction() as conn:
             cursor = conn.cursor()
             
             # Laboratory Orders Table
@@ -38,7 +171,14 @@ class CliniqDatabase:
                     urgency_level TEXT,
                     cost_efficiency INTEGER,
                     quality_check TEXT,
-                    session_id TEXT
+                    session_id TEXT,
+                    systolic_bp INTEGER,
+                    diastolic_bp INTEGER,
+                    heart_rate INTEGER,
+                    temperature REAL,
+                    respiratory_rate INTEGER,
+                    oxygen_saturation INTEGER,
+                    date_day TEXT GENERATED ALWAYS AS (DATE(timestamp)) STORED
                 )
             """)
             
@@ -74,62 +214,139 @@ class CliniqDatabase:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     content_id INTEGER,
                     content_type TEXT,  -- 'order', 'result', 'case_study'
-                    embedding_vector TEXT,  -- JSON string of vector
+                    embedding_vector BLOB,  -- float32 bytes (ältere Zeilen: JSON string)
+                    embedding_dim INTEGER,
                     metadata TEXT,      -- JSON string
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
             
-            conn.commit()
-    
-    def save_laboratory_order(self, patient_data: Dict[str, Any], lab_result: Dict[str, Any], session_id: str) -> int:
-        """Save a laboratory order to the database."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+            # Zufällige Kennung dieser Datenbankdatei; abgeleitete Dateien (Embedding-Matrix)
+            # erkennen daran, ob sie zu dieser Datenbank gehören
+            cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            cursor.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', lower(hex(randomblob(16))))"
+            )
             
-            cursor.execute("""
-                INSERT INTO laboratory_orders (
-                    patient_age, patient_gender, mts_category, diagnosis,
-                    comorbidities, vital_signs, symptom_duration, pain_scale,
-                    additional_notes, laboratory_values, reasoning,
-                    estimated_duration, urgency_level, cost_efficiency,
-                    quality_check, session_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            # Spalten, die ältere Datenbankdateien noch nicht haben
+            self._add_missing_columns(cursor, "embeddings", {"embedding_dim": "INTEGER"})
+            # Alte JSON-Embeddings einmalig in float32-BLOBs umschreiben
+            legacy = cursor.execute(
+                "SELECT id, embedding_vector FROM embeddings WHERE typeof(embedding_vector) = 'text'"
+            ).fetchall()
+            if legacy:
+                converted = []
+                for row_id, vector_json in legacy:
+                    vector = np.asarray(orjson.loads(vector_json), dtype=np.float32)
+                    converted.append((vector.tobytes(), len(vector), row_id))
+                cursor.executemany(
+                    "UPDATE embeddings SET embedding_vector = ?, embedding_dim = ? WHERE id = ?", converted
+                )
+            added_vitals = self._add_missing_columns(cursor, "laboratory_orders", VITAL_SIGN_COLUMNS)
+            if added_vitals:
+                # Bestehende Bestellungen einmalig aus dem JSON befüllen
+                assignments = ", ".join(f"{name} = json_extract(vital_signs, '$.{name}')" for name in added_vitals)
+                cursor.execute(f"UPDATE laboratory_orders SET {assignments} WHERE vital_signs IS NOT NULL")
+            # STORED lässt sich per ALTER TABLE nicht ergänzen, VIRTUAL ist indexierbar
+            self._add_missing_columns(cursor, "laboratory_orders",
+                                      {"date_day": "TEXT GENERATED ALWAYS AS (DATE(timestamp)) VIRTUAL"})
+            
+            # Indizes für Zeitraum-, Ähnlichkeits- und Ergebnisabfragen
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_ts ON laboratory_orders(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_diag_age ON laboratory_orders(diagnosis, patient_age)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_results_order ON laboratory_results(order_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_temperature ON laboratory_orders(temperature)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_date_day ON laboratory_orders(date_day)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_emb_ct_cid ON embeddings(content_type, content_id)")
+            
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    @staticmethod
+    def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]) -> List[str]:
+        """Add columns that older database files do not have yet; returns the added names."""
+        # table_xinfo listet auch generierte Spalten
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})")}
+        added = []
+        for name, declaration in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+                added.append(name)
+        return added
+    
+    @contextmanager
+    def bulk_load(self) -> Iterator[sqlite3.Connection]:
+        """Yield a single connection tuned for bulk inserts.
+        
+        All inserts made through the yielded connection run in one transaction
+        with fsync relaxed. The pooled connection is already in WAL mode, so
+        only the per-connection pragmas are switched and restored afterwards.
+        """
+        with self._conn() as conn:
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.execute("COMMIT")
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA temp_store=DEFAULT")
+        
+        self._invalidate_cost_cache()
+    
+    def save_laboratory_order(self, patient_data: Dict[str, Any], lab_result: Dict[str, Any], session_id: str,
+                              conn: Optional[sqlite3.Connection] = None) -> int:
+        """Save a laboratory order to the database.
+        
+        When ``conn`` is given (e.g. from ``bulk_load``), committing is left to the caller.
+        """
+        with self._transaction(conn) as conn:
+            vital_signs = patient_data['vital_signs']
+            # JSON-Spalten als TEXT binden (bytes würden als BLOB landen)
+            params = (
                 patient_data['patient_data']['age'],
                 patient_data['patient_data']['gender'],
                 patient_data['patient_data']['mts_category'],
                 patient_data['clinical_data']['suspected_diagnosis'],
-                json.dumps(patient_data['clinical_data']['comorbidities']),
-                json.dumps(patient_data['vital_signs']),
+                orjson.dumps(patient_data['clinical_data']['comorbidities']).decode(),
+                orjson.dumps(vital_signs).decode(),
                 patient_data['clinical_data']['symptom_duration'],
                 patient_data['clinical_data']['pain_scale'],
                 patient_data['clinical_data']['additional_notes'],
-                json.dumps(lab_result.get('laboratory_values', [])),
+                orjson.dumps(lab_result.get('laboratory_values', [])).decode(),
                 lab_result.get('reasoning', ''),
                 lab_result.get('estimated_duration', ''),
                 lab_result.get('urgency_level', ''),
                 lab_result.get('cost_efficiency', 0),
                 lab_result.get('quality_check', ''),
-                session_id
-            ))
-            
-            order_id = cursor.lastrowid
-            conn.commit()
-            return order_id
+                session_id,
+                vital_signs.get('systolic_bp'),
+                vital_signs.get('diastolic_bp'),
+                vital_signs.get('heart_rate'),
+                vital_signs.get('temperature'),
+                vital_signs.get('respiratory_rate'),
+                vital_signs.get('oxygen_saturation')
+            )
+            order_id = conn.execute(_INSERT_ORDER_SQL, params).lastrowid
+        
+        # Neue Bestellungen machen die gecachte Kostenanalyse ungültig
+        self._invalidate_cost_cache()
+        return order_id
     
-    def save_laboratory_results(self, order_id: int, results: List[Dict[str, Any]]):
-        """Save laboratory test results."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            for result in results:
-                cursor.execute("""
-                    INSERT INTO laboratory_results (
-                        order_id, parameter_name, value, unit,
-                        reference_min, reference_max, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
+    def save_laboratory_results(self, order_id: int, results: List[Dict[str, Any]],
+                                conn: Optional[sqlite3.Connection] = None):
+        """Save laboratory test results.
+        
+        When ``conn`` is given (e.g. from ``bulk_load``), committing is left to the caller.
+        """
+        with self._transaction(conn) as conn:
+            rows = [
+                (
                     order_id,
                     result['parameter_name'],
                     result['value'],
@@ -137,38 +354,89 @@ class CliniqDatabase:
                     result.get('reference_min'),
                     result.get('reference_max'),
                     result['status']
-                ))
+                )
+                for result in results
+            ]
             
-            conn.commit()
+            conn.executemany(_INSERT_RESULT_SQL, rows)
     
-    def get_orders_for_analysis(self, limit: int = 100) -> pd.DataFrame:
+    def get_orders_for_analysis(self, limit: int = 100) -> "pd.DataFrame":
         """Get laboratory orders for analysis."""
-        with sqlite3.connect(self.db_path) as conn:
+        # pandas erst bei Bedarf laden, der Import kostet beim Start spürbar Zeit
+        import pandas as pd
+        
+        if CONNECTORX_AVAILABLE:
+            # connectorx kennt keine Parameterbindung; limit wird als int eingesetzt
+            query = f"""
+                SELECT * FROM laboratory_orders 
+                ORDER BY timestamp DESC 
+                LIMIT {int(limit)}
+            """
+            df = cx.read_sql(f"sqlite://{Path(self.db_path).resolve()}", query, return_type="pandas")
+            return self._contiguous_frame(df)
+        
+        with self._conn() as conn:
             query = """
                 SELECT * FROM laboratory_orders 
                 ORDER BY timestamp DESC 
                 LIMIT ?
             """
-            return pd.read_sql_query(query, conn, params=(limit,))
+            df = pd.read_sql_query(query, conn, params=(limit,))
+        
+        return self._contiguous_frame(df)
+    
+    @staticmethod
+    def _contiguous_frame(df: "pd.DataFrame") -> "pd.DataFrame":
+        """Rebuild numeric columns as C-contiguous arrays so downstream aggregations stay cache-friendly."""
+        import pandas as pd
+        
+        return pd.DataFrame({
+            column: np.ascontiguousarray(df[column].to_numpy())
+            if pd.api.types.is_numeric_dtype(df[column]) else df[column]
+            for column in df.columns
+        }, index=df.index)
     
     def get_cost_analysis(self) -> Dict[str, Any]:
-        """Analyze cost efficiency trends."""
-        with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query("""
+        """Analyze cost efficiency trends.
+        
+        The result is reused within the same minute and dropped whenever an order is written.
+        """
+        bucket = int(time.time() // COST_ANALYSIS_TTL)
+        with self._cost_lock:
+            cached = self._cost_cache
+            if cached is not None and cached[0] == bucket:
+                return cached[1]
+            generation = self._cost_generation
+        
+        result = self._query_cost_analysis()
+        with self._cost_lock:
+            if self._cost_generation == generation:
+                self._cost_cache = (bucket, result)
+        return result
+    
+    def _invalidate_cost_cache(self):
+        """Drop the cached cost analysis after a committed write."""
+        with self._cost_lock:
+            self._cost_generation += 1
+            self._cost_cache = None
+    
+    def _query_cost_analysis(self) -> Dict[str, Any]:
+        """Run the cost analysis queries against the database."""
+        with self._conn() as conn:
+            cursor = conn.cursor()
+            
+            # Kennzahlen direkt als Skalare aus SQL
+            cursor.execute("""
                 SELECT 
-                    DATE(timestamp) as date,
-                    AVG(cost_efficiency) as avg_efficiency,
-                    COUNT(*) as total_orders,
-                    SUM(CASE WHEN cost_efficiency >= 4 THEN 1 ELSE 0 END) as efficient_orders,
-                    diagnosis,
-                    urgency_level
+                    COUNT(*),
+                    AVG(cost_efficiency),
+                    SUM(CASE WHEN cost_efficiency >= 4 THEN 1 ELSE 0 END)
                 FROM laboratory_orders 
-                WHERE timestamp >= date('now', '-30 days')
-                GROUP BY DATE(timestamp)
-                ORDER BY date DESC
-            """, conn)
+                WHERE date_day >= date('now', '-30 days')
+            """)
+            total_orders, avg_efficiency, efficient_orders = cursor.fetchone()
             
-            if df.empty:
+            if not total_orders:
                 return {
                     "total_orders": 0,
                     "avg_efficiency": 0,
@@ -177,10 +445,24 @@ class CliniqDatabase:
                     "trend_data": []
                 }
             
-            total_orders = df['total_orders'].sum()
-            avg_efficiency = df['avg_efficiency'].mean()
-            efficient_orders = df['efficient_orders'].sum()
-            efficiency_rate = (efficient_orders / total_orders * 100) if total_orders > 0 else 0
+            # Tagesverlauf nur für trend_data
+            cursor.row_factory = sqlite3.Row
+            cursor.execute("""
+                SELECT 
+                    date_day as date,
+                    AVG(cost_efficiency) as avg_efficiency,
+                    COUNT(*) as total_orders,
+                    SUM(CASE WHEN cost_efficiency >= 4 THEN 1 ELSE 0 END) as efficient_orders,
+                    diagnosis,
+                    urgency_level
+                FROM laboratory_orders 
+                WHERE date_day >= date('now', '-30 days')
+                GROUP BY date_day
+                ORDER BY date_day DESC
+            """)
+            trend_data = [dict(row) for row in cursor.fetchall()]
+            
+            efficiency_rate = efficient_orders / total_orders * 100
             
             # Geschätzte Kostenersparnis (basierend auf Effizienz)
             cost_per_test = 25  # Euro pro Test (Schätzung)
@@ -188,36 +470,78 @@ class CliniqDatabase:
             
             return {
                 "total_orders": int(total_orders),
-                "avg_efficiency": float(avg_efficiency),
+                "avg_efficiency": float(avg_efficiency or 0),
                 "efficiency_rate": float(efficiency_rate),
                 "cost_savings": float(potential_savings),
-                "trend_data": df.to_dict('records')
+                "trend_data": trend_data
             }
     
     def get_similar_cases(self, current_case: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
         """Find similar cases based on diagnosis and vital signs."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn() as conn:
             # Vereinfachte Ähnlichkeitssuche basierend auf Diagnose und Alter
+            # Prädikate direkt auf den Basisspalten statt auf den SELECT-Aliasen;
+            # LIKE '%…%' innerhalb des OR bleibt ein Tabellenscan
             query = """
                 SELECT *,
-                    ABS(patient_age - ?) as age_diff,
-                    CASE WHEN diagnosis LIKE ? THEN 1 ELSE 0 END as diagnosis_match
+                    ABS(patient_age - :age) as age_diff,
+                    (diagnosis LIKE :diag) as diagnosis_match
                 FROM laboratory_orders 
-                WHERE diagnosis_match = 1 OR age_diff <= 10
+                WHERE diagnosis LIKE :diag OR patient_age BETWEEN :age - 10 AND :age + 10
                 ORDER BY diagnosis_match DESC, age_diff ASC
-                LIMIT ?
+                LIMIT :lim
             """
             
-            df = pd.read_sql_query(query, conn, params=(
-                current_case['patient_data']['age'],
-                f"%{current_case['clinical_data']['suspected_diagnosis']}%",
-                limit
-            ))
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, {
+                "age": current_case['patient_data']['age'],
+                "diag": f"%{current_case['clinical_data']['suspected_diagnosis']}%",
+                "lim": limit
+            })
             
-            return df.to_dict('records')
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_top_comorbidities(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Count the most frequent comorbidities directly from the JSON column."""
+        with self._conn() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute("""
+                SELECT value as comorbidity, COUNT(*) as count
+                FROM laboratory_orders, json_each(laboratory_orders.comorbidities)
+                GROUP BY value
+                ORDER BY count DESC
+                LIMIT ?
+            """, (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_vital_sign_trends(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Daily averages of the vital signs from the typed vital-sign columns."""
+        with self._conn() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute("""
+                SELECT 
+                    date_day as date,
+                    AVG(systolic_bp) as avg_systolic_bp,
+                    AVG(diastolic_bp) as avg_diastolic_bp,
+                    AVG(heart_rate) as avg_heart_rate,
+                    AVG(temperature) as avg_temperature,
+                    AVG(respiratory_rate) as avg_respiratory_rate,
+                    AVG(oxygen_saturation) as avg_oxygen_saturation
+                FROM laboratory_orders 
+                WHERE date_day >= date('now', ?)
+                GROUP BY date_day
+                ORDER BY date_day DESC
+            """, (f"-{int(days)} days",))
+            return [dict(row) for row in cursor.fetchall()]
     
-    def create_sample_data(self):
-        """Create sample laboratory results for testing."""
+    def create_sample_data(self, progress: Optional[Callable[[int, int], None]] = None):
+        """Create sample laboratory results for testing.
+
+        ``progress`` is called with (done, total) after each sample case.
+        """
         sample_results = [
             # Beispiel 1: Appendizitis-Fall
             {
@@ -265,25 +589,31 @@ class CliniqDatabase:
             }
         ]
         
-        for sample in sample_results:
-            # Erstelle Lab Order Response
-            lab_response = {
-                "laboratory_values": [result["parameter_name"] for result in sample["lab_results"]],
-                "reasoning": "Basierend auf klinischen Symptomen und Vitalparametern",
-                "estimated_duration": "2-4",
-                "urgency_level": "hoch",
-                "cost_efficiency": 5,
-                "quality_check": "Empfehlung entspricht Leitlinien"
-            }
-            
-            # Speichere Order
-            order_id = self.save_laboratory_order(
-                sample["order_data"],
-                lab_response,
-                f"sample_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            )
-            
-            # Speichere Results
-            self.save_laboratory_results(order_id, sample["lab_results"])
+        # Alle Inserts in einer Transaktion auf einer Verbindung
+        with self.bulk_load() as conn:
+            for done, sample in enumerate(sample_results, start=1):
+                # Erstelle Lab Order Response
+                lab_response = {
+                    "laboratory_values": [result["parameter_name"] for result in sample["lab_results"]],
+                    "reasoning": "Basierend auf klinischen Symptomen und Vitalparametern",
+                    "estimated_duration": "2-4",
+                    "urgency_level": "hoch",
+                    "cost_efficiency": 5,
+                    "quality_check": "Empfehlung entspricht Leitlinien"
+                }
+                
+                # Speichere Order
+                order_id = self.save_laboratory_order(
+                    sample["order_data"],
+                    lab_response,
+                    f"sample_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                    conn=conn
+                )
+                
+                # Speichere Results
+                self.save_laboratory_results(order_id, sample["lab_results"], conn=conn)
+                
+                if progress is not None:
+                    progress(done, len(sample_results))
         
         print("Sample data created successfully!")
\ No newline at end of file
@@ -1,14 +1,27 @@
 import os
+import re
 import time
-import json
+import string
 import uuid
-from typing import Optional, Dict, Any
+import queue
+import hashlib
+import logging
+import threading
+import atexit
+import importlib.util
+from concurrent.futures import Future, ThreadPoolExecutor
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 
 import streamlit as st
-import openai
+from openai import AzureOpenAI
 from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
-import pandas as pd
+import orjson
+
+# Optional: plotly für die Dashboard-Diagramme, erst beim Zeichnen importiert
+PLOTLY_AVAILABLE = importlib.util.find_spec("plotly") is not None
 
 # Import our new modules
 from database import CliniqDatabase
@@ -16,20 +29,83 @@ from vector_store import CliniqVectorStore, CliniqAnalytics
 
 load_dotenv()
 
-# Initialize database and vector store
+DB_PATH = "cliniq_data.db"
+
+
+@st.cache_resource
+def get_db(db_path: str = DB_PATH) -> CliniqDatabase:
+    """Shared database handle; schema check and connection pool survive reruns."""
+    return CliniqDatabase(db_path)
+
+
+@st.cache_resource
+def get_background_executor() -> ThreadPoolExecutor:
+    """Prozessweiter Thread-Pool für Arbeiten, die parallel zum Skriptlauf erledigt werden."""
+    executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cliniq-bg")
+    atexit.register(executor.shutdown)
+    return executor
+
+
 @st.cache_resource
-def init_cliniq_system():
-    """Initialize the Cliniq system with database and vector store."""
-    db = CliniqDatabase()
-    vector_store = CliniqVectorStore()
-    analytics = CliniqAnalytics()
-    return db, vector_store, analytics
+def get_embedding_executor() -> ThreadPoolExecutor:
+    """Eigener Pool für Embedding-Schreibvorgänge, damit sie Abfragen nicht ausbremsen."""
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cliniq-embed")
+    atexit.register(executor.shutdown)
+    return executor
+
+
+logger = logging.getLogger(__name__)
+
+
+def _report_background_error(future: Future):
+    """Done-Callback: Fehler aus Hintergrundaufgaben protokollieren statt sie zu verschlucken."""
+    error = future.exception()
+    if error is not None:
+        logger.warning("Background task failed", exc_info=error)
 
-db, vector_store, analytics = init_cliniq_system()
+
+@st.cache_resource
+def get_vector_store(db_path: str = DB_PATH) -> CliniqVectorStore:
+    """Shared vector store; the embedding model is loaded once per process."""
+    return CliniqVectorStore(db_path)
+
+
+@st.cache_resource
+def get_analytics(db_path: str = DB_PATH) -> CliniqAnalytics:
+    """Shared analytics helper for the dashboard."""
+    return CliniqAnalytics(db_path)
+
+
+# Initialize database and vector store
+db = get_db()
+vector_store = get_vector_store()
+analytics = get_analytics()
 
 # Konfigurierbare Parameter - hier können Sie die Einstellungen einfach anpassen
 TEMPERATURE = 0.3  # Niedrigere Temperatur für präzisere medizinische Empfehlungen
-ASSISTANT_INSTRUCTION = """Du bist ein spezialisierter Labormedizin-Assistent für Krankenhäuser. Deine Aufgabe ist es, basierend auf den gegebenen Patientendaten, Vitalparametern und Verdachtsdiagnosen, eine präzise und kosteneffiziente Laborbeauftragung zu erstellen.
+STREAM_FLUSH_INTERVAL = 1 / 30  # Sekunden zwischen UI-Updates beim Streaming (max. ~30 pro Sekunde)
+RESPONSE_CACHE_TTL = 3600  # Sekunden, die eine Laborbeauftragung für identische Fälle wiederverwendet wird
+RESPONSE_CACHE_SIZE = 4096  # Maximale Anzahl exakt gecachter Fälle
+ANALYTICS_CACHE_TTL = 60  # Sekunden, die Dashboard-Kennzahlen zwischen Reruns wiederverwendet werden
+RECOMMENDATION_CACHE_TTL = 600  # Sekunden, die KI-Empfehlungen für identische Eingaben wiederverwendet werden
+RECOMMENDATION_CACHE_SIZE = 256  # Maximale Anzahl gecachter KI-Empfehlungen
+CACHE_KEY_AGE_STEP = 5  # Altersklassen in Jahren für den Cache-Schlüssel
+# Rasterung der Vitalparameter im Cache-Schlüssel (klinisch gleichwertige Werte treffen denselben Eintrag)
+CACHE_KEY_VITAL_STEPS = {
+    "systolic_bp": 5,
+    "diastolic_bp": 5,
+    "heart_rate": 5,
+    "temperature": 0.1,
+    "oxygen_saturation": 1,
+}
+# Kompakte Anweisung für jede Anfrage (kurzer Prefill)
+SHORT_INSTRUCTION = """Du bist Labormedizin-Assistent im Krankenhaus. Erstelle aus Patientendaten, Vitalparametern und Verdachtsdiagnose eine kosteneffiziente, Krankenkassen-konforme Laborbeauftragung: nur medizinisch notwendige Werte, die zur Verdachtsdiagnose und den Vitalparametern passen, keine "Nice-to-have"-Parameter.
+
+Vitalparameter → Labor: Fieber: Entzündungsparameter, Blutkulturen; Hypotonie: Elektrolyte, Nierenwerte, Herzenzyme; Tachykardie: Herzenzyme, Elektrolyte, Schilddrüse; Hypoxämie: Blutgasanalyse, D-Dimer, Herzenzyme; Hypertonie: Nierenwerte, Elektrolyte.
+
+Antworte nur mit einem JSON-Objekt mit den Feldern: diagnosis_confirmation (Text), laboratory_values (Liste), reasoning (Text), estimated_duration (Stunden, z.B. "2-4"), urgency_level ("niedrig", "mittel", "hoch" oder "sehr hoch"), cost_efficiency (1-5, 5=sehr effizient), quality_check (Text)."""
+# Ausführliche Anweisung mit Beispiel, nur für die Wiederholung nach unbrauchbarer Antwort
+FULL_INSTRUCTION = """Du bist ein spezialisierter Labormedizin-Assistent für Krankenhäuser. Deine Aufgabe ist es, basierend auf den gegebenen Patientendaten, Vitalparametern und Verdachtsdiagnosen, eine präzise und kosteneffiziente Laborbeauftragung zu erstellen.
 
 WICHTIG: Die beauftragten Laborwerte müssen:
 1. DIREKT zur Verdachtsdiagnose passen
@@ -45,7 +121,7 @@ BESONDERE BEACHTUNG der Vitalparameter:
 - Hypoxämie → Blutgasanalyse, D-Dimer, Herzenzyme
 - Hypertonie → Nierenwerte, Elektrolyte
 
-Gib eine strukturierte JSON-Antwort zurück mit folgenden Feldern:
+Gib ausschließlich ein JSON-Objekt (ohne Markdown) mit folgenden Feldern zurück:
 - diagnosis_confirmation: Bestätigung/Verfeinerung der Verdachtsdiagnose
 - laboratory_values: Liste der empfohlenen Laborwerte (nur die WIRKLICH notwendigen!)
 - reasoning: Medizinische Begründung für jeden Laborwert
@@ -64,6 +140,7 @@ Beispiel:
   "cost_efficiency": 5,
   "quality_check": "Empfehlung entspricht Leitlinien, kosteneffizient, diagnostisch aussagekräftig"
 }"""
+ASSISTANT_INSTRUCTION = SHORT_INSTRUCTION
 
 # MTS-Kategorien (Manchester Triage System)
 MTS_CATEGORIES = {
@@ -115,6 +192,26 @@ COMORBIDITIES = [
     "Allergien/Unverträglichkeiten"
 ]
 
+# Schmerzskala: Untergrenzen der Stufen 1-4 und die zugehörigen Bezeichnungen
+_PAIN_THRESHOLDS = (1, 4, 7, 9)
+_PAIN_LABELS = ("Kein Schmerz", "Leichter Schmerz", "Mäßiger Schmerz", "Starker Schmerz", "Unerträglicher Schmerz")
+
+# Labordauer: Obergrenzen in Stunden und die zugehörigen Anzeigen
+_DURATION_THRESHOLDS = (2, 4, 8, 24)
+_DURATION_LABELS = ("1-2 Stunden", "2-4 Stunden", "4-8 Stunden", "8-24 Stunden", "24-48 Stunden")
+
+# Dringlichkeitsstufen: Anzeige und Stufe (ab 2 sofortige Maßnahmen)
+_URGENCY_LEVELS = {
+    "niedrig": ("Niedrige Dringlichkeit", 0),
+    "mittel": ("Mittlere Dringlichkeit", 1),
+    "hoch": ("Hohe Dringlichkeit", 2),
+    "sehr hoch": ("Sehr hohe Dringlichkeit", 3),
+}
+
+# Tests mit deutlich längerer Laufzeit (Teilstring-Treffer)
+COMPLEX_TESTS = ["Blutkultur", "Mikrobiologie", "Genetik", "Histologie", "Zytologie", "PCR", "Kultur"]
+_COMPLEX_TEST_RE = re.compile("|".join(map(re.escape, COMPLEX_TESTS)))
+
 # Symptomdauer-Optionen
 SYMPTOM_DURATION = [
     "< 1 Stunde",
@@ -126,17 +223,32 @@ SYMPTOM_DURATION = [
     "> 1 Monat"
 ]
 
+# Vitalparameter der KI-Empfehlungsseite: Spalte -> (Minimum, Maximum, Schrittweite, Standardwert)
+AI_VITAL_COLUMNS = {
+    "Systolischer BD": (60, 250, 1, 120),
+    "Diastolischer BD": (30, 150, 1, 80),
+    "Puls": (30, 200, 1, 70),
+    "Temperatur": (35.0, 42.0, 0.1, 36.5),
+    "Atemfrequenz": (5, 60, 1, 16),
+    "SpO2 (%)": (70, 100, 1, 98),
+}
 
-def configure_openai():
-    """Configure the openai client for Azure OpenAI using environment variables.
-    """
-    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    api_key = os.getenv("AZURE_OPENAI_API_KEY")
-    api_version = os.getenv("OPENAI_API_VERSION")
+# HTML-Karte einer KI-Empfehlung (gefüllt per str.format_map)
+RECOMMENDATION_CARD_TEMPLATE = """
+<div style="background: white; padding: 1rem; border-radius: 8px; margin: 0.25rem 0; border: 1px solid #e5e7eb; text-align: center;">
+    <div style="color: {color}; font-weight: 600; font-size: 0.9rem;">{test}</div>
+    <div style="color: #6b7280; font-size: 0.8rem;">Konfidenz: {confidence:.0%}</div>
+    <div style="color: #9ca3af; font-size: 0.7rem;">{frequency}/{total_cases} Fälle</div>
+</div>
+"""
 
-    if not endpoint or not api_key:
-        raise ValueError("AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT environment variables are required")
 
+@st.cache_data(show_spinner=False)
+def _parse_azure_endpoint(endpoint: str) -> Tuple[str, str, Optional[str]]:
+    """Zerlegt AZURE_OPENAI_ENDPOINT in (api_base, deployment_name, api_version).
+
+    Gecacht pro Endpoint-String, da sich der Wert zur Laufzeit nicht ändert.
+    """
     # Parse the full endpoint URL to extract deployment and api version
     parsed = urlparse(endpoint)
     path = parsed.path or ""
@@ -153,6 +265,7 @@ def configure_openai():
         raise ValueError("Could not parse deployment name from AZURE_OPENAI_ENDPOINT")
 
     # Extract API version from query params if present
+    api_version = None
     if parsed.query:
         params = parse_qs(parsed.query)
         if "api-version" in params:
@@ -160,44 +273,207 @@ def configure_openai():
 
     # Build api_base without the deployment path and query
     api_base = f"{parsed.scheme}://{parsed.netloc}"
+    return api_base, deployment_name, api_version
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_base: str, api_key: str, api_version: Optional[str]) -> AzureOpenAI:
+    """Erstellt den Azure-OpenAI-Client einmal pro Prozess und Konfiguration.
+
+    Der Client hält seinen HTTP-Verbindungspool (Keep-Alive) über Anfragen hinweg offen.
+    """
+    return AzureOpenAI(azure_endpoint=api_base, api_key=api_key, api_version=api_version)
+
+
+@st.cache_resource(show_spinner=False)
+def configure_openai() -> Tuple[AzureOpenAI, Dict[str, Any]]:
+    """Configure the openai client for Azure OpenAI using environment variables.
+
+    Returns the shared client and the call arguments selecting the deployment.
+    Cached once per process; a missing configuration raises and is retried on the next call.
+    Callers must not mutate the returned dict.
+    """
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    api_version = os.getenv("OPENAI_API_VERSION")
+
+    if not endpoint or not api_key:
+        raise ValueError("AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT environment variables are required")
+
+    api_base, deployment_name, query_api_version = _parse_azure_endpoint(endpoint)
     
-    # Configure OpenAI client
-    openai.api_type = "azure"
-    openai.api_base = api_base
-    openai.api_version = api_version
-    openai.api_key = api_key
-    
-    return {"engine": deployment_name}  # Use engine instead of deployment for Azure
+    client = get_openai_client(api_base, api_key, query_api_version or api_version)
+    return client, {"model": deployment_name}  # Azure: model = deployment name
 
 
-def stream_completion(call_args):
+def stream_completion(client: AzureOpenAI, call_args):
     """Generator wrapper for streaming chat completions from openai.
 
     Yields text chunks as they arrive.
     """
-    # Engine is already properly set in call_args from configure_openai()
-    for chunk in openai.ChatCompletion.create(
+    # Model (deployment) is already properly set in call_args from configure_openai()
+    for chunk in client.chat.completions.create(
         stream=True,
         **call_args
     ):
-        # payload parsing depends on the library; each chunk may contain choices
-        if "choices" in chunk:
-            for choice in chunk["choices"]:
-                delta = choice.get("delta", {})
-                text = delta.get("content")
-                if text:
-                    yield text
+        # Azure sends chunks without choices (e.g. content filter results)
+        for choice in chunk.choices:
+            text = choice.delta.content if choice.delta else None
+            if text:
+                yield text
 
 
-def get_completion(call_args):
+def get_completion(client: AzureOpenAI, call_args):
     """Get a complete response from OpenAI API (non-streaming).
     
     Returns the full response text.
     """
-    response = openai.ChatCompletion.create(**call_args)
+    response = client.chat.completions.create(**call_args)
     return response.choices[0].message.content
 
 
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=1, show_spinner=False)
+def _cached_dashboard_data() -> Dict[str, Any]:
+    """Tageskennzahlen des Dashboards, pro Minute einmal aus der Datenbank gelesen."""
+    return analytics.get_real_time_dashboard_data()
+
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=1, show_spinner=False)
+def _cached_diagnosis_insights() -> Dict[str, Any]:
+    """Diagnose-Analysen des Dashboards, pro Minute einmal aus der Datenbank gelesen."""
+    return analytics.get_diagnosis_insights()
+
+
+def patient_data_key(patient_data: Dict[str, Any]) -> str:
+    """Hash der kanonisch serialisierten Patientendaten (ohne Zeitstempel).
+
+    Wird pro Übermittlung einmal berechnet und an alle Caches weitergereicht.
+    """
+    canonical = orjson.dumps(
+        {k: v for k, v in patient_data.items() if k != "timestamp"},
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+@st.cache_resource
+def get_recommendation_cache() -> Tuple["OrderedDict[str, Tuple[float, Dict[str, Any]]]", threading.Lock]:
+    """Prozessweiter LRU-Cache für KI-Empfehlungen: patient_key → (Zeitpunkt, Empfehlungen)."""
+    return OrderedDict(), threading.Lock()
+
+
+def _cached_recommendations(patient_key: str, patient_data: Dict[str, Any],
+                            cache: Optional[Tuple[OrderedDict, threading.Lock]] = None) -> Dict[str, Any]:
+    """KI-Empfehlungen aus ähnlichen Fällen; Cache-Schlüssel ist allein ``patient_key``.
+    
+    Kein ``st.cache_data``: die Funktion läuft auch in Hintergrund-Threads ohne
+    ScriptRunContext. Dort ``cache`` im Skript-Thread über ``get_recommendation_cache()``
+    holen und mitgeben.
+    """
+    entries, lock = cache or get_recommendation_cache()
+    with lock:
+        entry = entries.get(patient_key)
+        if entry and time.time() - entry[0] < RECOMMENDATION_CACHE_TTL:
+            entries.move_to_end(patient_key)
+            return entry[1]
+    
+    recommendations = vector_store.get_recommendations(patient_data)
+    with lock:
+        entries[patient_key] = (time.time(), recommendations)
+        entries.move_to_end(patient_key)
+        while len(entries) > RECOMMENDATION_CACHE_SIZE:
+            entries.popitem(last=False)
+    return recommendations
+
+
+def _embedding_saved_callback(recommendation_cache: Tuple[OrderedDict, threading.Lock]):
+    """Done-Callback für Embedding-Schreibvorgänge.
+    
+    Leert die Empfehlungen erst, wenn das neue Embedding gespeichert ist: zwischen
+    Bestellung und Embedding berechnete Empfehlungen kennen den neuen Fall noch nicht.
+    ``recommendation_cache`` im Skript-Thread holen, der Callback läuft im Worker.
+    """
+    def callback(future: Future):
+        _report_background_error(future)
+        if future.exception() is None:
+            entries, lock = recommendation_cache
+            with lock:
+                entries.clear()
+    return callback
+
+
+def invalidate_data_caches():
+    """Verwirft gecachte Dashboard-Daten und Empfehlungen nach neuen Bestellungen."""
+    _cached_dashboard_data.clear()
+    _cached_diagnosis_insights.clear()
+    entries, lock = get_recommendation_cache()
+    with lock:
+        entries.clear()
+
+
+@st.cache_resource
+def get_response_cache() -> Tuple["OrderedDict[str, Tuple[float, Dict[str, Any]]]", threading.Lock]:
+    """Prozessweiter LRU-Cache für Laborbeauftragungen: Fall-Hash → (Zeitpunkt, lab_result)."""
+    return OrderedDict(), threading.Lock()
+
+
+def _bucket(value: float, step: float) -> float:
+    """Rundet einen Messwert auf das nächste Vielfache von ``step``."""
+    return round(round(value / step) * step, 1)
+
+
+def _case_cache_key(patient_data: Dict[str, Any]) -> str:
+    """Hash des kanonischen Falls ohne Zeitstempel, mit gerasterten Vitalwerten und Altersklasse.
+    
+    Nur für die Cache-Suche; der Prompt verwendet weiterhin die Originalwerte.
+    """
+    vitals = {
+        name: _bucket(value, CACHE_KEY_VITAL_STEPS[name]) if name in CACHE_KEY_VITAL_STEPS else value
+        for name, value in patient_data['vital_signs'].items()
+        if name != "blood_pressure"  # abgeleitet aus systolic_bp/diastolic_bp
+    }
+    case = {
+        "patient_data": {
+            **patient_data['patient_data'],
+            "age": patient_data['patient_data']['age'] // CACHE_KEY_AGE_STEP * CACHE_KEY_AGE_STEP,
+        },
+        "vital_signs": vitals,
+        "clinical_data": patient_data['clinical_data'],
+    }
+    canonical = orjson.dumps(case, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+def find_cached_lab_result(patient_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Sucht eine wiederverwendbare Laborbeauftragung, bevor die API angefragt wird.
+    
+    Nur exakt über den kanonischen Fall (Altersklasse, Geschlecht, gerasterte Vitalwerte,
+    klinische Angaben). Eine Übernahme nach Embedding-Ähnlichkeit würde Fälle mit
+    klinisch verschiedenen Vitalwerten gleichsetzen.
+    """
+    cache, lock = get_response_cache()
+    key = _case_cache_key(patient_data)
+    with lock:
+        entry = cache.get(key)
+        if entry and time.time() - entry[0] < RESPONSE_CACHE_TTL:
+            cache.move_to_end(key)
+            return entry[1]
+    return None
+
+
+def store_cached_lab_result(patient_data: Dict[str, Any], lab_result: Dict[str, Any]):
+    """Legt eine erfolgreich geparste Laborbeauftragung im exakten Cache ab."""
+    if "laboratory_values" not in lab_result:
+        return
+    cache, lock = get_response_cache()
+    key = _case_cache_key(patient_data)
+    with lock:
+        cache[key] = (time.time(), lab_result)
+        cache.move_to_end(key)
+        while len(cache) > RESPONSE_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
 def create_laboratory_json(mts_category: str, gender: str, age: int, diagnosis: str, 
                           comorbidities: list, symptom_duration: str, pain_scale: int, 
                           additional_notes: str, systolic_bp: int, diastolic_bp: int,
@@ -250,36 +526,28 @@ def create_laboratory_json(mts_category: str, gender: str, age: int, diagnosis:
     }
 
 
-def create_laboratory_prompt(patient_data: Dict[str, Any]) -> str:
-    """Erstellt einen strukturierten Prompt für die Laborbeauftragung.
-    
-    Args:
-        patient_data: Dictionary mit den Patientendaten
-    
-    Returns:
-        Formatierter Prompt für die OpenAI API
-    """
-    prompt = f"""
+# Prompt-Vorlage für die Laborbeauftragung (Platzhalter = flache Felder aus create_laboratory_json)
+_PROMPT_TEMPLATE = string.Template("""
 LABORBEAUFTRAGUNG - PATIENTENFALL
 
 BASISDATEN:
-- MTS-Kategorie: {patient_data['patient_data']['mts_category']}
-- Geschlecht: {patient_data['patient_data']['gender']}
-- Alter: {patient_data['patient_data']['age']} Jahre
+- MTS-Kategorie: ${mts_category}
+- Geschlecht: ${gender}
+- Alter: ${age} Jahre
 
 VITALPARAMETER (WICHTIG FÜR LABORWERTE):
-- Blutdruck: {patient_data['vital_signs']['blood_pressure']} mmHg
-- Herzfrequenz: {patient_data['vital_signs']['heart_rate']} bpm
-- Körpertemperatur: {patient_data['vital_signs']['temperature']}°C
-- Atemfrequenz: {patient_data['vital_signs']['respiratory_rate']}/min
-- Sauerstoffsättigung: {patient_data['vital_signs']['oxygen_saturation']}%
+- Blutdruck: ${blood_pressure} mmHg
+- Herzfrequenz: ${heart_rate} bpm
+- Körpertemperatur: ${temperature}°C
+- Atemfrequenz: ${respiratory_rate}/min
+- Sauerstoffsättigung: ${oxygen_saturation}%
 
 KLINISCHE DATEN:
-- Verdachtsdiagnose: {patient_data['clinical_data']['suspected_diagnosis']}
-- Symptomdauer: {patient_data['clinical_data']['symptom_duration']}
-- Schmerzskala: {patient_data['clinical_data']['pain_scale']}/10
-- Vorerkrankungen: {', '.join(patient_data['clinical_data']['comorbidities']) if patient_data['clinical_data']['comorbidities'] else 'Keine angegeben'}
-- Zusätzliche Informationen: {patient_data['clinical_data']['additional_notes'] or 'Keine'}
+- Verdachtsdiagnose: ${suspected_diagnosis}
+- Symptomdauer: ${symptom_duration}
+- Schmerzskala: ${pain_scale}/10
+- Vorerkrankungen: ${comorbidities}
+- Zusätzliche Informationen: ${additional_notes}
 
 AUFGABE: Erstelle eine präzise, kosteneffiziente Laborbeauftragung, die:
 1. Nur diagnostisch relevante Parameter enthält
@@ -287,14 +555,64 @@ AUFGABE: Erstelle eine präzise, kosteneffiziente Laborbeauftragung, die:
 3. Krankenkassen-konform ist
 4. Keine überflüssigen Tests beinhaltet
 
-Zeitpunkt: {patient_data['timestamp']}
-"""
-    return prompt
+""")
+
+
+def _render_prompt_body(patient_data: Dict[str, Any]) -> str:
+    """Füllt die Prompt-Vorlage mit allen Falldaten außer dem Zeitpunkt."""
+    fields = {
+        **patient_data['patient_data'],
+        **patient_data['vital_signs'],
+        **patient_data['clinical_data'],
+    }
+    return _PROMPT_TEMPLATE.substitute(
+        fields,
+        comorbidities=', '.join(fields['comorbidities']) or 'Keine angegeben',
+        additional_notes=fields['additional_notes'] or 'Keine',
+    )
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _cached_prompt_body(patient_key: str, _patient_data: Dict[str, Any]) -> str:
+    """Prompt-Rumpf pro Patientendaten-Hash; der Zeitpunkt wird erst danach angehängt."""
+    return _render_prompt_body(_patient_data)
+
+
+def create_laboratory_prompt(patient_data: Dict[str, Any], patient_key: Optional[str] = None) -> str:
+    """Erstellt einen strukturierten Prompt für die Laborbeauftragung.
+    
+    Args:
+        patient_data: Dictionary mit den Patientendaten
+        patient_key: Optionaler Hash aus ``patient_data_key``; damit wird der Rumpf gecacht
+    
+    Returns:
+        Formatierter Prompt für die OpenAI API
+    """
+    if patient_key is not None:
+        body = _cached_prompt_body(patient_key, patient_data)
+    else:
+        body = _render_prompt_body(patient_data)
+    return f"{body}Zeitpunkt: {patient_data['timestamp']}\n"
+
+
+def build_lab_messages(prompt: str, instruction: str = ASSISTANT_INSTRUCTION) -> List[Dict[str, str]]:
+    """Nachrichtenliste für die Laborbeauftragung.
+    
+    Die Systemnachricht ist immer eine unveränderte Modulkonstante an erster Stelle,
+    nur die Nutzernachricht variiert. So bleibt der Präfix byte-identisch und Azure
+    kann ihn aus dem Prompt-Cache bedienen.
+    """
+    return [
+        {"role": "system", "content": instruction},
+        {"role": "user", "content": prompt}
+    ]
 
 
 def parse_openai_response(response_text: str) -> Dict[str, Any]:
     """Parst die OpenAI-Antwort und extrahiert JSON-Felder.
     
+    Die Anfrage erzwingt ``response_format=json_object``, die Antwort ist daher reines JSON.
+    
     Args:
         response_text: Rohe Antwort von der OpenAI API
     
@@ -302,25 +620,7 @@ def parse_openai_response(response_text: str) -> Dict[str, Any]:
         Dictionary mit den extrahierten Feldern oder Fehlermeldung
     """
     try:
-        # Versuche, JSON aus der Antwort zu extrahieren
-        # Manchmal ist die JSON-Antwort in Markdown-Codeblöcken eingebettet
-        if "```json" in response_text:
-            start = response_text.find("```json") + 7
-            end = response_text.find("```", start)
-            json_str = response_text[start:end].strip()
-        elif response_text.strip().startswith("{"):
-            json_str = response_text.strip()
-        else:
-            # Falls kein JSON gefunden wird, erstelle eine strukturierte Antwort
-            return {
-                "name": "Unstrukturierte Antwort",
-                "score": 0.5,
-                "recommendation": response_text,
-                "details": "Die API hat keine strukturierte JSON-Antwort geliefert",
-                "urgency": "medium"
-            }
-        
-        parsed_data = json.loads(json_str)
+        parsed_data = orjson.loads(response_text)
         
         # Validiere und ergänze fehlende Felder
         required_fields = ["name", "score", "recommendation", "details", "urgency"]
@@ -330,7 +630,7 @@ def parse_openai_response(response_text: str) -> Dict[str, Any]:
         
         return parsed_data
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         return {
             "name": "JSON-Parsing-Fehler",
             "score": 0.0,
@@ -348,16 +648,211 @@ def parse_openai_response(response_text: str) -> Dict[str, Any]:
         }
 
 
-def render_laboratory_form():
-    """Rendert das Laborbeauftragungsformular."""
-    st.markdown("""
+def stream_lab_result(client: AzureOpenAI, call_args: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+    """Streamt die Laborbeauftragung in die Seite und parst sie.
+    
+    Liefert die erste Antwort keine Laborwerte, wird einmal mit der ausführlichen
+    Anweisung (FULL_INSTRUCTION) erneut angefragt.
+    """
+    # Antwort streamen: die ersten Tokens erscheinen sofort statt nach der vollständigen Antwort
+    stream_placeholder = st.empty()
+    with stream_placeholder.container():
+        st.caption("Erstelle kostenoptimierte Laborbeauftragung...")
+        response = st.write_stream(stream_completion(client, call_args))
+    
+    # Antwort parsen und Rohtext durch die aufbereiteten Ergebnisse ersetzen
+    lab_result = parse_openai_response(response)
+    if "laboratory_values" not in lab_result:
+        # Unbrauchbare Antwort: einmal mit der ausführlichen Anweisung wiederholen
+        retry_args = {**call_args, "messages": build_lab_messages(prompt, FULL_INSTRUCTION)}
+        with stream_placeholder.container():
+            st.caption("Antwort unvollständig, erneuter Versuch mit ausführlicher Anweisung...")
+            response = st.write_stream(stream_completion(client, retry_args))
+        lab_result = parse_openai_response(response)
+    stream_placeholder.empty()
+    return lab_result
+
+
+# Kennzahlen-Raster: mehrere Metriken in einem einzigen Markdown-Element (ohne Leerzeilen, sonst endet der HTML-Block)
+METRIC_GRID_TEMPLATE = '<div class="metric-grid" style="--metric-columns: {columns};">{cells}</div>'
+METRIC_CELL_TEMPLATE = '<div><p class="metric-label">{label}</p><p class="metric-value">{value}</p></div>'
+METRIC_CARD_TEMPLATE = (
+    '<div class="metric-card">'
+    '<h4 style="color: #1e40af; margin: 0 0 0.5rem 0;">{title}</h4>'
+    '<p style="font-size: 1.8rem; font-weight: 700; color: {color}; margin: 0;">{value}</p>'
+    '<p style="color: #6b7280; font-size: 0.9rem; margin: 0.25rem 0 0 0;">{caption}</p>'
+    '</div>'
+)
+
+
+def _metric_grid_html(cells: List[str]) -> str:
+    """Fügt fertige Zellen zu einem Raster mit einer Spalte pro Zelle zusammen."""
+    return METRIC_GRID_TEMPLATE.format(columns=len(cells), cells="".join(cells))
+
+
+# Inter-Schrift per <link> laden: der Browser holt sie parallel statt erst nach dem Parsen eines @import
+FONT_LINKS = """
+<link rel="preconnect" href="https://fonts.googleapis.com">
+<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap">
+"""
+
+
+@st.cache_resource(show_spinner=False)
+def _static_css() -> str:
+    """Stylesheet der gesamten App, einmal pro Prozess zusammengesetzt."""
+    return FONT_LINKS + """
+    <style>
+    /* Metric Cards */
+    .metric-card {
+        background: var(--background-color);
+        padding: 1.5rem;
+        border-radius: 12px;
+        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
+        border-left: 4px solid #3b82f6;
+        margin: 0.5rem 0;
+        transition: transform 0.2s ease;
+        color: var(--text-color);
+    }
+    
+    .metric-card:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 16px rgba(0, 0, 0, 0.15);
+    }
+    
+    /* Kennzahlen-Raster */
+    .metric-grid {
+        display: grid;
+        grid-template-columns: repeat(var(--metric-columns, 3), minmax(0, 1fr));
+        gap: 1rem;
+        margin: 0.5rem 0;
+    }
+    
+    .metric-grid .metric-label {
+        color: #6b7280;
+        font-size: 0.875rem;
+        margin: 0;
+    }
+    
+    .metric-grid .metric-value {
+        font-size: 1.75rem;
+        font-weight: 600;
+        margin: 0;
+    }
+    
+    /* Professional Header */
+    .pro-header {
+        background: linear-gradient(135deg, #1e40af 0%, #1e3a8a 100%);
+        color: white;
+        padding: 2rem;
+        border-radius: 16px;
+        margin-bottom: 2rem;
+        text-align: center;
+        box-shadow: 0 8px 32px rgba(30, 64, 175, 0.3);
+    }
+    
+    .pro-header h1 {
+        color: white !important;
+        border: none !important;
+        text-shadow: 0 2px 4px rgba(0, 0, 0, 0.3);
+        margin-bottom: 0.5rem;
+        font-family: 'Inter', sans-serif;
+    }
+    
+    .pro-header p {
+        font-size: 1.1rem;
+        opacity: 0.9;
+        margin: 0;
+        font-family: 'Inter', sans-serif;
+    }
+    
+    /* Enhanced Buttons (nur für Primary Buttons) */
+    .stButton > button[kind="primary"] {
+        background: linear-gradient(135deg, #3b82f6 0%, #1e40af 100%) !important;
+        color: white !important;
+        border: none !important;
+        border-radius: 8px !important;
+        font-weight: 600 !important;
+        transition: all 0.2s ease !important;
+        box-shadow: 0 4px 12px rgba(59, 130, 246, 0.3) !important;
+        font-family: 'Inter', sans-serif !important;
+    }
+    
+    .stButton > button[kind="primary"]:hover {
+        background: linear-gradient(135deg, #1d4ed8 0%, #1e3a8a 100%) !important;
+        transform: translateY(-1px) !important;
+        box-shadow: 0 6px 16px rgba(59, 130, 246, 0.4) !important;
+    }
+    
+    /* Sidebar Medical Branding */
+    section[data-testid="stSidebar"] {
+        background: linear-gradient(180deg, #1e40af 0%, #1e3a8a 100%) !important;
+    }
+    
+    section[data-testid="stSidebar"] .stMarkdown {
+        color: rgba(255, 255, 255, 0.9) !important;
+    }
+    
+    section[data-testid="stSidebar"] .stRadio > div {
+        background: rgba(255, 255, 255, 0.1) !important;
+        border-radius: 12px !important;
+        padding: 1rem !important;
+        margin: 0.5rem 0 !important;
+    }
+    
+    section[data-testid="stSidebar"] .stRadio label {
+        color: white !important;
+        font-weight: 500 !important;
+    }
+    </style>
+    """
+
+
+@st.cache_data(show_spinner=False)
+def _pro_header_html(title: str, subtitle: str) -> str:
+    """Seitenkopf im Pro-Header-Stil, pro Seite nur einmal formatiert."""
+    return f"""
+    <div class="pro-header">
+        <h1>{title}</h1>
+        <p>{subtitle}</p>
+    </div>
+    """
+
+
+@st.cache_data(show_spinner=False)
+def _mts_keys() -> List[str]:
+    """Anzeigenamen der MTS-Kategorien, einmal pro Prozess erzeugt."""
+    return list(MTS_CATEGORIES.keys())
+
+
+@st.cache_data(show_spinner=False)
+def _form_header_html() -> str:
+    """Kopfbereich des Laborformulars, einmal pro Prozess erzeugt."""
+    return """
     <div style="background: white; padding: 1.5rem; border-radius: 12px; box-shadow: 0 4px 16px rgba(0,0,0,0.1); margin: 1rem 0;">
         <h3 style="color: #1e40af; margin: 0 0 0.5rem 0; font-weight: 600;">📋 Patientendaten erfassen</h3>
         <p style="color: #6b7280; margin: 0; font-style: italic;">Einfache und sichere Eingabe für medizinisches Fachpersonal</p>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+
+def _remove_custom_comorbidities(conditions: List[str]):
+    """Callback: entfernt custom Vorerkrankungen samt ihrer Auswahl vor dem Fragment-Rerun."""
+    st.session_state.custom_comorbidities = [
+        c for c in st.session_state.custom_comorbidities if c not in conditions
+    ]
+    st.session_state.comorbidities = [
+        c for c in st.session_state.get('comorbidities', []) if c not in conditions
+    ]
+
+
+@st.fragment
+def _comorbidity_manager():
+    """Verwaltung der custom Vorerkrankungen und Auswahl der Vorerkrankungen.
     
-    # Custom Vorerkrankungen Management AUSSERHALB des Forms
+    Hinzufügen, Löschen und Auswahl rerunnen nur dieses Fragment statt der ganzen Seite;
+    das Formular liest die Auswahl über den Key ``comorbidities`` aus ``st.session_state``.
+    """
     st.markdown("""
     <div style="background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%); padding: 1rem; border-radius: 8px; border-left: 4px solid #0ea5e9; margin: 1rem 0;">
         <strong style="color: #0c4a6e;">➕ Zusätzliche Vorerkrankungen verwalten</strong>
@@ -381,9 +876,9 @@ def render_laboratory_form():
         st.write("") # Spacing
         if st.button("Hinzufügen", key="add_comorbidity"):
             if new_comorbidity.strip():
+                # Liste und Auswahl werden erst danach gerendert, ein Rerun ist nicht nötig
                 if new_comorbidity.strip() not in st.session_state.custom_comorbidities:
                     st.session_state.custom_comorbidities.append(new_comorbidity.strip())
-                    st.rerun()
                 else:
                     st.warning("Diese Vorerkrankung wurde bereits hinzugefügt!")
     
@@ -397,17 +892,34 @@ def render_laboratory_form():
                 with col_inner1:
                     st.write(f"[Custom] {custom_condition}")
                 with col_inner2:
-                    if st.button("Löschen", key=f"delete_custom_{idx}", help="Löschen"):
-                        st.session_state.custom_comorbidities.pop(idx)
-                        st.rerun()
+                    st.button("Löschen", key=f"delete_custom_{idx}", help="Löschen",
+                              on_click=_remove_custom_comorbidities, args=([custom_condition],))
         
         # Reset-Button für alle custom Vorerkrankungen
-        if st.button("Alle custom Vorerkrankungen zurücksetzen", key="reset_custom"):
-            st.session_state.custom_comorbidities = []
-            st.rerun()
-    
-    st.markdown("---")
+        st.button("Alle custom Vorerkrankungen zurücksetzen", key="reset_custom",
+                  on_click=_remove_custom_comorbidities, args=(list(st.session_state.custom_comorbidities),))
+    
+    # Wichtige Vorerkrankungen
+    # Kombinierte Liste: Standard + Custom Vorerkrankungen
+    custom_comorbidities = st.session_state.custom_comorbidities
+    
+    # Ein Widget statt einer Checkbox pro Vorerkrankung
+    st.multiselect(
+        "Wichtige Vorerkrankungen/Zusatzinformationen:",
+        options=COMORBIDITIES + custom_comorbidities,
+        # Kennzeichnung für custom Vorerkrankungen
+        format_func=lambda condition: f"[Custom] {condition}" if condition in custom_comorbidities else condition,
+        key="comorbidities"
+    )
+
+
+@st.fragment
+def _vitals_fragment():
+    """Live-Vitalparameter und Schmerzskala mit sofortiger Bewertung.
     
+    Als Fragment läuft bei einer Eingabe nur dieser Abschnitt erneut; die Werte
+    liest das Formular über die ``live_*``-Keys aus ``st.session_state``.
+    """
     # Vitalparameter AUSSERHALB des Forms für Live-Updates
     st.markdown("""
     <div style="background: linear-gradient(135deg, #f0fdf4 0%, #dcfce7 100%); padding: 1.5rem; border-radius: 12px; border-left: 4px solid #22c55e; margin: 1.5rem 0;">
@@ -416,9 +928,10 @@ def render_laboratory_form():
     </div>
     """, unsafe_allow_html=True)
     
-    col1, col2, col3 = st.columns(3)
+    # Ein Spalten-Layout für alle Eingaben; die Bewertungen landen in Platzhaltern darunter
+    cols = st.columns(3)
     
-    with col1:
+    with cols[0]:
         # Blutdruck
         systolic_bp = st.number_input(
             "Systolischer Blutdruck (mmHg):",
@@ -432,22 +945,12 @@ def render_laboratory_form():
             "Diastolischer Blutdruck (mmHg):",
             min_value=30,
             max_value=150,
-            value=80,
-            help="Unterer Blutdruckwert",
-            key="live_diastolic_bp"
-        )
-        
-        # Blutdruck-Bewertung - Live Update
-        if systolic_bp >= 180 or diastolic_bp >= 110:
-            st.error("Hypertensive Krise!")
-        elif systolic_bp >= 140 or diastolic_bp >= 90:
-            st.warning("Hypertonie")
-        elif systolic_bp < 90 or diastolic_bp < 60:
-            st.warning("Hypotonie")
-        else:
-            st.success("Normaler Blutdruck")
+            value=80,
+            help="Unterer Blutdruckwert",
+            key="live_diastolic_bp"
+        )
     
-    with col2:
+    with cols[1]:
         # Puls
         heart_rate = st.number_input(
             "Puls (bpm):",
@@ -468,20 +971,8 @@ def render_laboratory_form():
             help="Körpertemperatur in Celsius",
             key="live_temperature"
         )
-        
-        # Temperatur-Bewertung - Live Update
-        if temperature >= 38.5:
-            st.error("Hohes Fieber")
-        elif temperature >= 38.0:
-            st.warning("Fieber")
-        elif temperature >= 37.5:
-            st.info("Subfebrile Temperatur")
-        elif temperature < 36.0:
-            st.warning("Hypothermie")
-        else:
-            st.success("Normale Temperatur")
     
-    with col3:
+    with cols[2]:
         # Atemfrequenz
         respiratory_rate = st.number_input(
             "Atemfrequenz (/min):",
@@ -501,21 +992,22 @@ def render_laboratory_form():
             help="SpO2 in Prozent",
             key="live_oxygen_saturation"
         )
-        
-        # Sauerstoffsättigung-Bewertung - Live Update
-        if oxygen_saturation < 90:
-            st.error("Schwere Hypoxämie")
-        elif oxygen_saturation < 94:
-            st.warning("Hypoxämie")
-        elif oxygen_saturation < 96:
-            st.info("Leichte Hypoxämie")
+    
+    status = [col.empty() for col in cols]
+    
+    # Blutdruck-Bewertung - Live Update
+    with status[0].container():
+        if systolic_bp >= 180 or diastolic_bp >= 110:
+            st.error("Hypertensive Krise!")
+        elif systolic_bp >= 140 or diastolic_bp >= 90:
+            st.warning("Hypertonie")
+        elif systolic_bp < 90 or diastolic_bp < 60:
+            st.warning("Hypotonie")
         else:
-            st.success("Normale Sättigung")
+            st.success("Normaler Blutdruck")
     
-    # Puls- und Atemfrequenz-Bewertung (nach den Spalten) - Live Update
-    col_pulse = st.columns([1, 2, 1])
-    with col_pulse[1]:
-        # Puls-Status
+    # Puls- und Temperatur-Bewertung - Live Update
+    with status[1].container():
         if heart_rate > 100:
             st.warning(f"Tachykardie ({heart_rate} bpm)")
         elif heart_rate < 60:
@@ -523,13 +1015,34 @@ def render_laboratory_form():
         else:
             st.success(f"Normaler Puls ({heart_rate} bpm)")
         
-        # Atemfrequenz-Status
+        if temperature >= 38.5:
+            st.error("Hohes Fieber")
+        elif temperature >= 38.0:
+            st.warning("Fieber")
+        elif temperature >= 37.5:
+            st.info("Subfebrile Temperatur")
+        elif temperature < 36.0:
+            st.warning("Hypothermie")
+        else:
+            st.success("Normale Temperatur")
+    
+    # Atemfrequenz- und Sauerstoffsättigung-Bewertung - Live Update
+    with status[2].container():
         if respiratory_rate > 20:
             st.warning(f"Tachypnoe ({respiratory_rate}/min)")
         elif respiratory_rate < 12:
             st.info(f"Bradypnoe ({respiratory_rate}/min)")
         else:
             st.success(f"Normale Atmung ({respiratory_rate}/min)")
+        
+        if oxygen_saturation < 90:
+            st.error("Schwere Hypoxämie")
+        elif oxygen_saturation < 94:
+            st.warning("Hypoxämie")
+        elif oxygen_saturation < 96:
+            st.info("Leichte Hypoxämie")
+        else:
+            st.success("Normale Sättigung")
     
     # Schmerzskala AUSSERHALB des Forms
     st.markdown("""
@@ -547,25 +1060,35 @@ def render_laboratory_form():
     )
     
     # Anzeige der Schmerzstufe - Live Update
-    pain_labels = {
-        (0, 1): "Kein Schmerz",
-        (1, 4): "Leichter Schmerz",
-        (4, 7): "Mäßiger Schmerz", 
-        (7, 9): "Starker Schmerz",
-        (9, 11): "Unerträglicher Schmerz"
-    }
+    label = _PAIN_LABELS[bisect_right(_PAIN_THRESHOLDS, pain_scale)]
+    if pain_scale >= 7:
+        st.error(f"Bewertung: {label}")
+    elif pain_scale >= 4:
+        st.warning(f"Bewertung: {label}")
+    elif pain_scale >= 1:
+        st.info(f"Bewertung: {label}")
+    else:
+        st.success(f"Bewertung: {label}")
+
+
+def render_laboratory_form():
+    """Rendert das Laborbeauftragungsformular."""
+    st.markdown(_form_header_html(), unsafe_allow_html=True)
     
-    for (min_val, max_val), label in pain_labels.items():
-        if min_val <= pain_scale < max_val:
-            if pain_scale >= 7:
-                st.error(f"Bewertung: {label}")
-            elif pain_scale >= 4:
-                st.warning(f"Bewertung: {label}")
-            elif pain_scale >= 1:
-                st.info(f"Bewertung: {label}")
-            else:
-                st.success(f"Bewertung: {label}")
-            break
+    # Custom Vorerkrankungen Management AUSSERHALB des Forms
+    _comorbidity_manager()
+    
+    st.markdown("---")
+    
+    # Vitalparameter AUSSERHALB des Forms: Eingaben rerunnen nur das Fragment
+    _vitals_fragment()
+    systolic_bp = st.session_state.live_systolic_bp
+    diastolic_bp = st.session_state.live_diastolic_bp
+    heart_rate = st.session_state.live_heart_rate
+    temperature = st.session_state.live_temperature
+    respiratory_rate = st.session_state.live_respiratory_rate
+    oxygen_saturation = st.session_state.live_oxygen_saturation
+    pain_scale = st.session_state.live_pain_scale
     
     st.markdown("---")
     
@@ -578,7 +1101,7 @@ def render_laboratory_form():
         with col1:
             mts_category_display = st.selectbox(
                 "MTS-Kategorie (Manchester Triage):",
-                options=list(MTS_CATEGORIES.keys()),
+                options=_mts_keys(),
                 help="Triage-Kategorie bestimmt die Dringlichkeit"
             )
             mts_category = MTS_CATEGORIES[mts_category_display]
@@ -629,24 +1152,6 @@ def render_laboratory_form():
                 help="Wie lange bestehen die Symptome bereits?"
             )
         
-        # Wichtige Vorerkrankungen
-        st.markdown("**Wichtige Vorerkrankungen/Zusatzinformationen:**")
-        selected_comorbidities = []
-        
-        # Kombinierte Liste: Standard + Custom Vorerkrankungen
-        all_comorbidities = COMORBIDITIES.copy()
-        if 'custom_comorbidities' in st.session_state:
-            all_comorbidities.extend(st.session_state.custom_comorbidities)
-        
-        # Aufteilen in 3 Spalten für bessere Darstellung
-        cols = st.columns(3)
-        for i, condition in enumerate(all_comorbidities):
-            with cols[i % 3]:
-                # Kennzeichnung für custom Vorerkrankungen
-                display_name = f"[Custom] {condition}" if condition in st.session_state.get('custom_comorbidities', []) else condition
-                if st.checkbox(display_name, key=f"comorbidity_{i}"):
-                    selected_comorbidities.append(condition)
-        
         # Zusätzliche Anmerkungen
         additional_notes = st.text_area(
             "Zusätzliche Anmerkungen:",
@@ -662,7 +1167,7 @@ def render_laboratory_form():
         )
     
     return (submitted, mts_category, gender, age, final_diagnosis, 
-            selected_comorbidities, symptom_duration, pain_scale, additional_notes,
+            st.session_state.comorbidities, symptom_duration, pain_scale, additional_notes,
             systolic_bp, diastolic_bp, heart_rate, temperature, respiratory_rate, oxygen_saturation)
 
 
@@ -690,23 +1195,11 @@ def render_laboratory_results(lab_result: Dict[str, Any]):
         per_test_time = 0.25  # 15 Minuten pro Test
         estimated_hours = base_time + (num_tests * per_test_time)
         
-        # Spezielle Tests benötigen mehr Zeit
-        complex_tests = ["Blutkultur", "Mikrobiologie", "Genetik", "Histologie", "Zytologie", "PCR", "Kultur"]
-        for test in lab_values:
-            if any(complex in test for complex in complex_tests):
-                estimated_hours += 2  # 2 Stunden extra für komplexe Tests
+        # Spezielle Tests benötigen mehr Zeit (2 Stunden extra für komplexe Tests)
+        estimated_hours += 2 * sum(1 for test in lab_values if _COMPLEX_TEST_RE.search(test))
         
         # Aufrunden auf realistische Werte
-        if estimated_hours <= 2:
-            duration_display = "1-2 Stunden"
-        elif estimated_hours <= 4:
-            duration_display = "2-4 Stunden" 
-        elif estimated_hours <= 8:
-            duration_display = "4-8 Stunden"
-        elif estimated_hours <= 24:
-            duration_display = "8-24 Stunden"
-        else:
-            duration_display = "24-48 Stunden"
+        duration_display = _DURATION_LABELS[bisect_left(_DURATION_THRESHOLDS, estimated_hours)]
         # Custom Metric Card for Duration
         st.markdown(f"""
         <div class="metric-card">
@@ -765,17 +1258,14 @@ def render_laboratory_results(lab_result: Dict[str, Any]):
     st.info(reasoning)
     
     # Dringlichkeitsstufe
-    urgency = lab_result.get("urgency_level", "medium")
-    urgency_colors = {
-        "niedrig": "Niedrige Dringlichkeit",
-        "mittel": "Mittlere Dringlichkeit", 
-        "hoch": "Hohe Dringlichkeit",
-        "sehr hoch": "Sehr hohe Dringlichkeit"
-    }
-    
-    urgency_display = urgency_colors.get(urgency.lower(), f"{urgency}")
+    urgency = str(lab_result.get("urgency_level", "medium"))
+    urgency_key = urgency.strip().lower()
+    # Unbekannte Freitexte behalten ihre Anzeige; "hoch" darin löst weiterhin die Warnung aus
+    urgency_display, urgency_tier = _URGENCY_LEVELS.get(
+        urgency_key, (urgency, 2 if "hoch" in urgency_key else 1)
+    )
     
-    if "hoch" in urgency.lower():
+    if urgency_tier >= 2:
         st.error(f"**Dringlichkeit**: {urgency_display}")
         st.error("**Sofortige Maßnahmen erforderlich!** Labor umgehend beauftragen.")
     else:
@@ -808,11 +1298,8 @@ def render_laboratory_results(lab_result: Dict[str, Any]):
                 avg_hours = 2.0
                 min_hours = max_hours = avg_hours
             
-            # Einfache Visualisierung
-            progress_bar = st.progress(0)
-            for i in range(int(avg_hours) + 1):
-                progress_bar.progress(min(i / max_hours, 1.0))
-                time.sleep(0.05)  # Schnellere Animation
+            # Einfache Visualisierung: Endstand direkt anzeigen, ohne den Rerun zu blockieren
+            st.progress(min(int(avg_hours) / max_hours, 1.0))
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -827,7 +1314,8 @@ def render_laboratory_results(lab_result: Dict[str, Any]):
     
     # JSON-Daten anzeigen (erweitert)
     with st.expander("Technische Details (Vollständige API-Antwort)"):
-        st.json(lab_result)
+        # Vorformatierter String statt st.json: kein Baum-Widget, das den Dict bei jedem Rerun durchläuft
+        st.code(orjson.dumps(lab_result, option=orjson.OPT_INDENT_2).decode(), language="json")
 
 
 def render_ai_recommendations(recommendations: Dict[str, Any]):
@@ -843,16 +1331,15 @@ def render_ai_recommendations(recommendations: Dict[str, Any]):
         st.markdown("**🔬 Empfohlene Laborwerte:**")
         cols = st.columns(min(3, len(recommendations['recommended_tests'])))
         
+        # Karten pro Spalte sammeln und je Spalte in einem einzigen Markdown-Element ausgeben
+        column_parts = [[] for _ in cols]
         for i, test_rec in enumerate(recommendations['recommended_tests'][:6]):
-            with cols[i % 3]:
-                confidence_color = "#10b981" if test_rec['confidence'] >= 0.7 else "#f59e0b" if test_rec['confidence'] >= 0.5 else "#6b7280"
-                st.markdown(f"""
-                <div style="background: white; padding: 1rem; border-radius: 8px; margin: 0.25rem 0; border: 1px solid #e5e7eb; text-align: center;">
-                    <div style="color: {confidence_color}; font-weight: 600; font-size: 0.9rem;">{test_rec['test']}</div>
-                    <div style="color: #6b7280; font-size: 0.8rem;">Konfidenz: {test_rec['confidence']:.0%}</div>
-                    <div style="color: #9ca3af; font-size: 0.7rem;">{test_rec['frequency']}/{test_rec['total_cases']} Fälle</div>
-                </div>
-                """, unsafe_allow_html=True)
+            confidence_color = "#10b981" if test_rec['confidence'] >= 0.7 else "#f59e0b" if test_rec['confidence'] >= 0.5 else "#6b7280"
+            column_parts[i % len(cols)].append(
+                RECOMMENDATION_CARD_TEMPLATE.format_map({**test_rec, "color": confidence_color})
+            )
+        for col, parts in zip(cols, column_parts):
+            col.markdown("".join(parts), unsafe_allow_html=True)
         
         st.markdown(f"**💡 Begründung:** {recommendations['reasoning']}")
         
@@ -868,93 +1355,137 @@ def render_ai_recommendations(recommendations: Dict[str, Any]):
                     """)
 
 
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=16, show_spinner=False)
+def _plotly_figure(kind: str, x: Tuple, y: Tuple):
+    """Plotly-Figur aus fertigen Wertereihen; unveränderte Daten liefern die gecachte Figur."""
+    import plotly.graph_objects as go
+
+    if kind == "bar":
+        trace = go.Bar(x=list(x), y=list(y))
+    else:
+        trace = go.Scatter(x=list(x), y=list(y), mode="lines+markers")
+    fig = go.Figure(trace)
+    fig.update_layout(height=300, margin=dict(l=0, r=0, t=10, b=0))
+    return fig
+
+
+def create_sample_data_with_status(label: str):
+    """Erstellt Beispieldaten im Hintergrund-Thread und zeigt den Fortschritt in einem Status-Element."""
+    updates: "queue.Queue[Tuple[int, int]]" = queue.Queue()
+    future = get_background_executor().submit(
+        db.create_sample_data, lambda done, total: updates.put((done, total))
+    )
+    
+    with st.status(label) as status:
+        while not (future.done() and updates.empty()):
+            try:
+                done, total = updates.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            status.update(label=f"{label} ({done}/{total} Fälle)")
+        # Fehler aus dem Worker hier weiterreichen
+        future.result()
+        status.update(label="Beispieldaten erstellt", state="complete")
+    
+    invalidate_data_caches()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _live_stats_html(today_orders: int, estimated_savings: float, efficiency_rate: float) -> str:
+    """Sidebar-Block mit den echten Tageskennzahlen; gleiche Zahlen liefern das gecachte HTML."""
+    savings = f"{estimated_savings:,.0f}".replace(",", ".")
+    return f"""
+        <div style="background: rgba(255,255,255,0.1); padding: 1rem; border-radius: 8px; backdrop-filter: blur(5px);">
+            <h4 style="color: white; margin: 0 0 1rem 0;">📊 Live-Statistiken</h4>
+            <div style="margin: 0.5rem 0;">
+                <p style="color: rgba(255,255,255,0.7); margin: 0; font-size: 0.8rem;">Heute beauftragt</p>
+                <p style="color: white; margin: 0; font-size: 1.2rem; font-weight: 600;">{today_orders} Aufträge</p>
+            </div>
+            <div style="margin: 0.5rem 0;">
+                <p style="color: rgba(255,255,255,0.7); margin: 0; font-size: 0.8rem;">Kostenersparnis</p>
+                <p style="color: #10b981; margin: 0; font-size: 1.2rem; font-weight: 600;">€{savings}</p>
+            </div>
+            <div style="margin: 0.5rem 0;">
+                <p style="color: rgba(255,255,255,0.7); margin: 0; font-size: 0.8rem;">Effizienzrate</p>
+                <p style="color: #22c55e; margin: 0; font-size: 1.2rem; font-weight: 600;">{efficiency_rate:.1f}%</p>
+            </div>
+        </div>
+        """
+
+
+@st.fragment
 def render_analytics_dashboard():
     """Rendert das Analytics Dashboard."""
-    st.markdown("""
-    <div class="pro-header">
-        <h1>📊 Analytics Dashboard</h1>
-        <p>Einblicke und Trends für optimierte Laborbeauftragung</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_pro_header_html("📊 Analytics Dashboard", "Einblicke und Trends für optimierte Laborbeauftragung"), unsafe_allow_html=True)
     
     # Real-time Dashboard Data
     try:
-        dashboard_data = analytics.get_real_time_dashboard_data()
-        
-        # Top Metriken
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4 style="color: #1e40af; margin: 0 0 0.5rem 0;">📋 Heute beauftragt</h4>
-                <p style="font-size: 1.8rem; font-weight: 700; color: #1e3a8a; margin: 0;">{dashboard_data['today_orders']}</p>
-                <p style="color: #6b7280; font-size: 0.9rem; margin: 0.25rem 0 0 0;">Laborbeauftragungen</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            efficiency_color = "#10b981" if dashboard_data['today_efficiency'] >= 4 else "#f59e0b"
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4 style="color: #1e40af; margin: 0 0 0.5rem 0;">⚡ Effizienz</h4>
-                <p style="font-size: 1.8rem; font-weight: 700; color: {efficiency_color}; margin: 0;">{dashboard_data['today_efficiency']:.1f}/5</p>
-                <p style="color: #6b7280; font-size: 0.9rem; margin: 0.25rem 0 0 0;">Durchschnitt heute</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4 style="color: #1e40af; margin: 0 0 0.5rem 0;">💰 Ersparnis</h4>
-                <p style="font-size: 1.8rem; font-weight: 700; color: #10b981; margin: 0;">€{dashboard_data['estimated_savings']:.0f}</p>
-                <p style="color: #6b7280; font-size: 0.9rem; margin: 0.25rem 0 0 0;">Geschätzt heute</p>
-            </div>
-            """, unsafe_allow_html=True)
+        dashboard_data = _cached_dashboard_data()
         
-        with col4:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4 style="color: #1e40af; margin: 0 0 0.5rem 0;">📈 Effizienzrate</h4>
-                <p style="font-size: 1.8rem; font-weight: 700; color: #059669; margin: 0;">{dashboard_data['efficiency_rate']:.1f}%</p>
-                <p style="color: #6b7280; font-size: 0.9rem; margin: 0.25rem 0 0 0;">Effiziente Tests</p>
-            </div>
-            """, unsafe_allow_html=True)
+        # Top Metriken als ein Raster statt vier Spalten mit je eigenem Element
+        efficiency_color = "#10b981" if dashboard_data['today_efficiency'] >= 4 else "#f59e0b"
+        st.markdown(_metric_grid_html([
+            METRIC_CARD_TEMPLATE.format(
+                title="📋 Heute beauftragt", color="#1e3a8a",
+                value=dashboard_data['today_orders'], caption="Laborbeauftragungen"),
+            METRIC_CARD_TEMPLATE.format(
+                title="⚡ Effizienz", color=efficiency_color,
+                value=f"{dashboard_data['today_efficiency']:.1f}/5", caption="Durchschnitt heute"),
+            METRIC_CARD_TEMPLATE.format(
+                title="💰 Ersparnis", color="#10b981",
+                value=f"€{dashboard_data['estimated_savings']:.0f}", caption="Geschätzt heute"),
+            METRIC_CARD_TEMPLATE.format(
+                title="📈 Effizienzrate", color="#059669",
+                value=f"{dashboard_data['efficiency_rate']:.1f}%", caption="Effiziente Tests"),
+        ]), unsafe_allow_html=True)
         
         # Wochentrend
         if dashboard_data['week_trend']:
             st.subheader("📈 7-Tage Trend")
-            trend_df = pd.DataFrame(dashboard_data['week_trend'])
+            week_trend = dashboard_data['week_trend']
+            # Rohe Wertereihen statt DataFrame mit Datumsindex
+            dates = tuple(row['date'] for row in week_trend)
+            orders = tuple(row['orders'] for row in week_trend)
+            efficiency = tuple(row['efficiency'] for row in week_trend)
             
             col1, col2 = st.columns(2)
             with col1:
-                st.line_chart(trend_df.set_index('date')['orders'])
+                if PLOTLY_AVAILABLE:
+                    st.plotly_chart(_plotly_figure("line", dates, orders))
+                else:
+                    st.line_chart({"date": dates, "orders": orders}, x="date", y="orders")
                 st.caption("Anzahl Bestellungen pro Tag")
             
             with col2:
-                st.line_chart(trend_df.set_index('date')['efficiency'])
+                if PLOTLY_AVAILABLE:
+                    st.plotly_chart(_plotly_figure("line", dates, efficiency))
+                else:
+                    st.line_chart({"date": dates, "efficiency": efficiency}, x="date", y="efficiency")
                 st.caption("Durchschnittliche Effizienz pro Tag")
         
         # Top Diagnosen
         if dashboard_data['top_diagnoses']:
             st.subheader("🏥 Häufigste Diagnosen heute")
-            diagnoses_df = pd.DataFrame(dashboard_data['top_diagnoses'])
-            st.bar_chart(diagnoses_df.set_index('diagnosis')['count'])
+            top_diagnoses = dashboard_data['top_diagnoses']
+            diagnoses = tuple(row['diagnosis'] for row in top_diagnoses)
+            counts = tuple(row['count'] for row in top_diagnoses)
+            if PLOTLY_AVAILABLE:
+                st.plotly_chart(_plotly_figure("bar", diagnoses, counts))
+            else:
+                st.bar_chart({"diagnosis": diagnoses, "count": counts}, x="diagnosis", y="count")
         
         # Diagnose-Insights
         st.subheader("🔍 Diagnose-Analysen")
-        diagnosis_insights = analytics.get_diagnosis_insights()
+        diagnosis_insights = _cached_diagnosis_insights()
         
         if diagnosis_insights['insights']:
             for insight in diagnosis_insights['insights'][:5]:
                 with st.expander(f"📊 {insight['diagnosis']} ({insight['frequency']} Fälle)"):
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Durchschnittsalter", f"{insight['avg_age']:.1f} Jahre")
-                    with col2:
-                        st.metric("Effizienz", f"{insight['avg_efficiency']:.1f}/5")
-                    with col3:
-                        st.metric("Häufigkeit", f"{insight['frequency']} Fälle")
+                    st.markdown(_metric_grid_html([
+                        METRIC_CELL_TEMPLATE.format(label="Durchschnittsalter", value=f"{insight['avg_age']:.1f} Jahre"),
+                        METRIC_CELL_TEMPLATE.format(label="Effizienz", value=f"{insight['avg_efficiency']:.1f}/5"),
+                        METRIC_CELL_TEMPLATE.format(label="Häufigkeit", value=f"{insight['frequency']} Fälle"),
+                    ]), unsafe_allow_html=True)
                     
                     if insight['common_tests']:
                         st.write("**Häufige Tests:**")
@@ -963,8 +1494,7 @@ def render_analytics_dashboard():
         # Sample Data Button
         st.markdown("---")
         if st.button("📊 Beispieldaten erstellen (für Testing)"):
-            with st.spinner("Erstelle Beispieldaten..."):
-                db.create_sample_data()
+            create_sample_data_with_status("Erstelle Beispieldaten...")
             st.success("✅ Beispieldaten erfolgreich erstellt!")
             st.rerun()
             
@@ -973,14 +1503,10 @@ def render_analytics_dashboard():
         st.info("💡 Tipp: Erstellen Sie zuerst einige Laborbeauftragungen, um Analytics zu sehen.")
 
 
+@st.fragment
 def render_ai_suggestions_page():
     """Rendert die KI-Empfehlungsseite."""
-    st.markdown("""
-    <div class="pro-header">
-        <h1>🤖 KI-Empfehlungen</h1>
-        <p>Intelligente Laborempfehlungen basierend auf ähnlichen Fällen</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_pro_header_html("🤖 KI-Empfehlungen", "Intelligente Laborempfehlungen basierend auf ähnlichen Fällen"), unsafe_allow_html=True)
     
     st.markdown("""
     <div style="background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%); padding: 1.5rem; border-radius: 12px; border-left: 4px solid #0ea5e9; margin: 1rem 0;">
@@ -1006,21 +1532,29 @@ def render_ai_suggestions_page():
             symptom_duration = st.selectbox("Symptomdauer:", SYMPTOM_DURATION)
             pain_scale = st.slider("Schmerzskala:", 0, 10, 0)
         
-        # Vitalparameter
+        # Vitalparameter als eine editierbare Zeile statt sechs einzelner Eingabefelder
         st.markdown("**Vitalparameter:**")
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            systolic_bp = st.number_input("Systolischer BD:", min_value=60, max_value=250, value=120)
-            heart_rate = st.number_input("Puls:", min_value=30, max_value=200, value=70)
-        
-        with col2:
-            diastolic_bp = st.number_input("Diastolischer BD:", min_value=30, max_value=150, value=80)
-            temperature = st.number_input("Temperatur:", min_value=35.0, max_value=42.0, value=36.5, step=0.1)
-        
-        with col3:
-            respiratory_rate = st.number_input("Atemfrequenz:", min_value=5, max_value=60, value=16)
-            oxygen_saturation = st.number_input("SpO2 (%):", min_value=70, max_value=100, value=98)
+        edited_vitals = st.data_editor(
+            {label: [spec[3]] for label, spec in AI_VITAL_COLUMNS.items()},
+            column_config={
+                label: st.column_config.NumberColumn(label, min_value=lo, max_value=hi, step=step, required=True)
+                for label, (lo, hi, step, _) in AI_VITAL_COLUMNS.items()
+            },
+            num_rows="fixed",
+            hide_index=True,
+            key="ai_vitals",
+        )
+        # Leere Zellen fallen auf den Standardwert zurück
+        vitals = {
+            label: edited_vitals[label][0] if edited_vitals[label][0] is not None else spec[3]
+            for label, spec in AI_VITAL_COLUMNS.items()
+        }
+        systolic_bp = int(vitals["Systolischer BD"])
+        diastolic_bp = int(vitals["Diastolischer BD"])
+        heart_rate = int(vitals["Puls"])
+        temperature = float(vitals["Temperatur"])
+        respiratory_rate = int(vitals["Atemfrequenz"])
+        oxygen_saturation = int(vitals["SpO2 (%)"])
         
         submitted = st.form_submit_button("🤖 KI-Empfehlungen abrufen", type="primary")
     
@@ -1052,19 +1586,19 @@ def render_ai_suggestions_page():
         
         # Hole KI-Empfehlungen
         with st.spinner("🔍 Analysiere ähnliche Fälle und generiere Empfehlungen..."):
-            recommendations = vector_store.get_recommendations(patient_data)
+            recommendations = _cached_recommendations(patient_data_key(patient_data), patient_data)
         
         if recommendations['similar_cases_count'] > 0:
             render_ai_recommendations(recommendations)
         else:
             st.warning("⚠️ Keine ähnlichen Fälle in der Datenbank gefunden. Erstellen Sie zuerst einige Laborbeauftragungen oder laden Sie Beispieldaten.")
             if st.button("📊 Beispieldaten laden"):
-                with st.spinner("Lade Beispieldaten..."):
-                    db.create_sample_data()
+                create_sample_data_with_status("Lade Beispieldaten...")
                 st.success("✅ Beispieldaten geladen! Versuchen Sie es erneut.")
                 st.rerun()
 
 
+@st.fragment
 def render_chat_interface():
     """Rendert das ursprüngliche Chat-Interface."""
     st.header("Freier Chat")
@@ -1075,7 +1609,7 @@ def render_chat_interface():
 
     if run and prompt.strip():
         try:
-            config = configure_openai()
+            client, config = configure_openai()
         except ValueError as e:
             st.error(str(e))
             return
@@ -1090,17 +1624,22 @@ def render_chat_interface():
         }
 
         placeholder = st.empty()
-        full_text = ""
+        parts: List[str] = []
+        last_flush = time.monotonic()
 
         with placeholder.container():
             st.markdown("**Assistant:**")
             message_area = st.empty()
 
         try:
-            for chunk in stream_completion(call_args):
-                full_text += chunk
-                message_area.markdown(full_text)
-                time.sleep(0.02)
+            for chunk in stream_completion(client, call_args):
+                parts.append(chunk)
+                # Gebündelt rendern statt pro Token; der Text wird nur beim Flush zusammengesetzt
+                now = time.monotonic()
+                if now - last_flush > STREAM_FLUSH_INTERVAL:
+                    message_area.markdown("".join(parts))
+                    last_flush = now
+            message_area.markdown("".join(parts))
         except Exception as e:
             st.exception(e)
 
@@ -1114,94 +1653,7 @@ def main():
     )
     
     # Minimales Professional Medical Styling
-    st.markdown("""
-    <style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-    
-    /* Metric Cards */
-    .metric-card {
-        background: var(--background-color);
-        padding: 1.5rem;
-        border-radius: 12px;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
-        border-left: 4px solid #3b82f6;
-        margin: 0.5rem 0;
-        transition: transform 0.2s ease;
-        color: var(--text-color);
-    }
-    
-    .metric-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 16px rgba(0, 0, 0, 0.15);
-    }
-    
-    /* Professional Header */
-    .pro-header {
-        background: linear-gradient(135deg, #1e40af 0%, #1e3a8a 100%);
-        color: white;
-        padding: 2rem;
-        border-radius: 16px;
-        margin-bottom: 2rem;
-        text-align: center;
-        box-shadow: 0 8px 32px rgba(30, 64, 175, 0.3);
-    }
-    
-    .pro-header h1 {
-        color: white !important;
-        border: none !important;
-        text-shadow: 0 2px 4px rgba(0, 0, 0, 0.3);
-        margin-bottom: 0.5rem;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .pro-header p {
-        font-size: 1.1rem;
-        opacity: 0.9;
-        margin: 0;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Enhanced Buttons (nur für Primary Buttons) */
-    .stButton > button[kind="primary"] {
-        background: linear-gradient(135deg, #3b82f6 0%, #1e40af 100%) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 8px !important;
-        font-weight: 600 !important;
-        transition: all 0.2s ease !important;
-        box-shadow: 0 4px 12px rgba(59, 130, 246, 0.3) !important;
-        font-family: 'Inter', sans-serif !important;
-    }
-    
-    .stButton > button[kind="primary"]:hover {
-        background: linear-gradient(135deg, #1d4ed8 0%, #1e3a8a 100%) !important;
-        transform: translateY(-1px) !important;
-        box-shadow: 0 6px 16px rgba(59, 130, 246, 0.4) !important;
-    }
-    
-    /* Sidebar Medical Branding */
-    section[data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #1e40af 0%, #1e3a8a 100%) !important;
-    }
-    
-    section[data-testid="stSidebar"] .stMarkdown {
-        color: rgba(255, 255, 255, 0.9) !important;
-    }
-    
-    section[data-testid="stSidebar"] .stRadio > div {
-        background: rgba(255, 255, 255, 0.1) !important;
-        border-radius: 12px !important;
-        padding: 1rem !important;
-        margin: 0.5rem 0 !important;
-    }
-    
-    section[data-testid="stSidebar"] .stRadio label {
-        color: white !important;
-        font-weight: 500 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_static_css(), unsafe_allow_html=True)
     
     # Sidebar für Navigation
     with st.sidebar:
@@ -1231,23 +1683,14 @@ def main():
         """.format(TEMPERATURE), unsafe_allow_html=True)
         
         st.markdown("---")
-        st.markdown("""
-        <div style="background: rgba(255,255,255,0.1); padding: 1rem; border-radius: 8px; backdrop-filter: blur(5px);">
-            <h4 style="color: white; margin: 0 0 1rem 0;">📊 Live-Statistiken</h4>
-            <div style="margin: 0.5rem 0;">
-                <p style="color: rgba(255,255,255,0.7); margin: 0; font-size: 0.8rem;">Heute beauftragt</p>
-                <p style="color: white; margin: 0; font-size: 1.2rem; font-weight: 600;">127 Tests</p>
-            </div>
-            <div style="margin: 0.5rem 0;">
-                <p style="color: rgba(255,255,255,0.7); margin: 0; font-size: 0.8rem;">Kostenersparnis</p>
-                <p style="color: #10b981; margin: 0; font-size: 1.2rem; font-weight: 600;">€2.340</p>
-            </div>
-            <div style="margin: 0.5rem 0;">
-                <p style="color: rgba(255,255,255,0.7); margin: 0; font-size: 0.8rem;">Erfolgsquote</p>
-                <p style="color: #22c55e; margin: 0; font-size: 1.2rem; font-weight: 600;">94.7%</p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        try:
+            stats = _cached_dashboard_data()
+            st.markdown(
+                _live_stats_html(stats['today_orders'], stats['estimated_savings'], stats['efficiency_rate']),
+                unsafe_allow_html=True,
+            )
+        except Exception as e:
+            st.caption(f"Live-Statistiken nicht verfügbar: {e}")
         
         st.markdown("---")
         st.error("**WICHTIG:** Nur medizinisch notwendige Tests beauftragen! Überflüssige Tests gefährden die Krankenhausfinanzierung.")
@@ -1255,12 +1698,7 @@ def main():
     # Hauptinhalt basierend auf Navigation
     if page == "Laborbeauftragung":
         # Professional Header
-        st.markdown("""
-        <div class="pro-header">
-            <h1>🏥 Cliniq - Intelligente Laborbeauftragung</h1>
-            <p>Kostenoptimierte Labordiagnostik für moderne Krankenhäuser</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_pro_header_html("🏥 Cliniq - Intelligente Laborbeauftragung", "Kostenoptimierte Labordiagnostik für moderne Krankenhäuser"), unsafe_allow_html=True)
         
         # Formular rendern
         form_result = render_laboratory_form()
@@ -1280,61 +1718,86 @@ def main():
                 
                 # Patientendaten anzeigen
                 with st.expander("Erfasste Patientendaten (JSON)"):
-                    st.json(patient_data)
+                    st.code(orjson.dumps(patient_data, option=orjson.OPT_INDENT_2).decode(), language="json")
                 
-                # OpenAI API-Aufruf für Laborbeauftragung
-                try:
-                    config = configure_openai()
-                    
-                    # Prompt für Laborbeauftragung erstellen
-                    prompt = create_laboratory_prompt(patient_data)
-                    
-                    call_args = {
-                        **config,
-                        "messages": [
-                            {"role": "system", "content": ASSISTANT_INSTRUCTION},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": TEMPERATURE,
-                    }
-                    
-                    # KI-Empfehlungen basierend auf ähnlichen Fällen abrufen
-                    with st.spinner("Analysiere ähnliche Fälle..."):
-                        recommendations = vector_store.get_recommendations(patient_data)
-                    
+                # Erneutes Absenden derselben Daten in dieser Sitzung: nichts neu anfragen oder speichern
+                patient_key = patient_data_key(patient_data)
+                submission_key = f"lab:{patient_key}"
+                previous_submission = st.session_state.get(submission_key)
+                
+                if previous_submission is not None:
+                    lab_result, recommendations, order_id = previous_submission
                     if recommendations['recommended_tests']:
                         st.info("🤖 **KI-Empfehlungen basierend auf ähnlichen Fällen gefunden!**")
                         with st.expander("📊 KI-Empfehlungen anzeigen"):
                             render_ai_recommendations(recommendations)
+                    st.info("♻️ Identische Laborbeauftragung wurde in dieser Sitzung bereits erstellt")
+                    render_laboratory_results(lab_result)
+                    st.success(f"✅ Laborbeauftragung bereits gespeichert (ID: {order_id})")
+                else:
+                    # OpenAI API-Aufruf für Laborbeauftragung
+                    try:
+                        # Identische oder nahezu identische Fälle ohne erneute API-Anfrage beantworten
+                        cached_result = find_cached_lab_result(patient_data)
                     
-                    # API-Aufruf mit Ladeanzeige
-                    with st.spinner("Erstelle kostenoptimierte Laborbeauftragung..."):
-                        response = get_completion(call_args)
+                        # KI-Empfehlungen parallel zur API-Anfrage berechnen; Anzeige an dieser Stelle nachtragen
+                        recommendations_future = get_background_executor().submit(
+                            _cached_recommendations, patient_key, patient_data, get_recommendation_cache()
+                        )
+                        recommendations_placeholder = st.empty()
                     
-                    # Antwort parsen und Ergebnisse anzeigen
-                    lab_result = parse_openai_response(response)
+                        if cached_result is not None:
+                            lab_result = cached_result
+                            st.info("♻️ Laborbeauftragung aus einem gleichartigen Fall übernommen (keine erneute KI-Anfrage)")
+                        else:
+                            # Client erst bei einem Cache-Fehltreffer auflösen
+                            client, config = configure_openai()
                     
-                    # Speichere die Bestellung in der Datenbank
-                    session_id = str(uuid.uuid4())
-                    order_id = db.save_laboratory_order(patient_data, lab_result, session_id)
+                            # Prompt für Laborbeauftragung erstellen
+                            prompt = create_laboratory_prompt(patient_data, patient_key)
                     
-                    # Speichere Embedding für zukünftige Empfehlungen
-                    try:
-                        vector_store.save_embedding(order_id, patient_data, lab_result)
-                    except Exception as e:
-                        st.warning(f"Embedding konnte nicht gespeichert werden: {e}")
+                            call_args = {
+                                **config,
+                                "messages": build_lab_messages(prompt),
+                                "temperature": TEMPERATURE,
+                                # Erzwingt reines JSON (kein Markdown-Codeblock um die Antwort)
+                                "response_format": {"type": "json_object"},
+                            }
                     
-                    render_laboratory_results(lab_result)
+                            lab_result = stream_lab_result(client, call_args, prompt)
+                            store_cached_lab_result(patient_data, lab_result)
+                    
+                        with st.spinner("Analysiere ähnliche Fälle..."):
+                            recommendations = recommendations_future.result()
                     
-                    # Success message
-                    st.success(f"✅ Laborbeauftragung erfolgreich gespeichert (ID: {order_id})")
+                        if recommendations['recommended_tests']:
+                            with recommendations_placeholder.container():
+                                st.info("🤖 **KI-Empfehlungen basierend auf ähnlichen Fällen gefunden!**")
+                                with st.expander("📊 KI-Empfehlungen anzeigen"):
+                                    render_ai_recommendations(recommendations)
                     
-                except ValueError as e:
-                    st.error(f"Konfigurationsfehler: {str(e)}")
-                    st.info("Bitte überprüfen Sie Ihre Azure OpenAI-Einstellungen in der .env-Datei")
-                except Exception as e:
-                    st.error(f"Fehler bei der API-Anfrage: {str(e)}")
-                    st.info("Überprüfen Sie Ihre Internetverbindung und API-Konfiguration.")
+                        # Speichere die Bestellung in der Datenbank
+                        session_id = str(uuid.uuid4())
+                        order_id = db.save_laboratory_order(patient_data, lab_result, session_id)
+                        invalidate_data_caches()
+                        st.session_state[submission_key] = (lab_result, recommendations, order_id)
+                    
+                        # Speichere Embedding für zukünftige Empfehlungen im Hintergrund
+                        get_embedding_executor().submit(
+                            vector_store.save_embedding, order_id, patient_data, lab_result
+                        ).add_done_callback(_embedding_saved_callback(get_recommendation_cache()))
+                    
+                        render_laboratory_results(lab_result)
+                    
+                        # Success message
+                        st.success(f"✅ Laborbeauftragung erfolgreich gespeichert (ID: {order_id})")
+                    
+                    except ValueError as e:
+                        st.error(f"Konfigurationsfehler: {str(e)}")
+                        st.info("Bitte überprüfen Sie Ihre Azure OpenAI-Einstellungen in der .env-Datei")
+                    except Exception as e:
+                        st.error(f"Fehler bei der API-Anfrage: {str(e)}")
+                        st.info("Überprüfen Sie Ihre Internetverbindung und API-Konfiguration.")
     
     elif page == "Analytics Dashboard":
         render_analytics_dashboard()
@@ -1344,12 +1807,7 @@ def main():
         
     elif page == "Konsultation":
         # Professional Header for Consultation
-        st.markdown("""
-        <div class="pro-header">
-            <h1>💬 Medizinische Konsultation</h1>
-            <p>KI-gestützte medizinische Beratung und Entscheidungsunterstützung</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_pro_header_html("💬 Medizinische Konsultation", "KI-gestützte medizinische Beratung und Entscheidungsunterstützung"), unsafe_allow_html=True)
         render_chat_interface()
 
 
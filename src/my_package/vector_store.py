@@ -1,209 +1,640 @@
 import numpy as np
-import pandas as pd
-from typing import List, Dict, Any, Tuple
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import hashlib
+import importlib.util
 import json
+import os
 import sqlite3
+import threading
 
-# Optional: Try to import sentence_transformers and sklearn
+# Optional: sentence_transformers (lädt torch) erst beim Erzeugen des Stores importieren
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+# Optional: SimSIMD für den Kosinus-Scan mit SIMD-Kerneln
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+# Optional: FAISS-HNSW-Index statt linearem Scan bei großen Beständen
 try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
+    import faiss
+    FAISS_AVAILABLE = True
 except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
+    FAISS_AVAILABLE = False
 
+# Optional: Numba-JIT-Kernel für den Scan, falls SimSIMD fehlt
 try:
-    from sklearn.metrics.pairwise import cosine_similarity
-    SKLEARN_AVAILABLE = True
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
 except ImportError:
-    SKLEARN_AVAILABLE = False
+    NUMBA_AVAILABLE = False
+
+# Ab so vielen Embeddings lohnt sich der (approximative) HNSW-Index gegenüber dem exakten Scan
+HNSW_MIN_ROWS = 10_000
+
+# int64-Wörter im Kopf der Id-Datei: database_id (16 Bytes), Anzahl, MAX(id)
+MATRIX_HEADER_WORDS = 4
+
+# Zeilen pro fetchmany-Block beim Laden der Embedding-Matrix
+FETCH_BATCH_SIZE = 4096
+
+# Texte pro model.encode-Batch beim Erzeugen von Embeddings
+ENCODE_BATCH_SIZE = 64
+
+# Maximale Anzahl gecachter Text-Embeddings (Fallbeschreibung → Vektor)
+ENCODE_CACHE_SIZE = 2048
+
+# So viele Kandidaten aus dem int8-Vorscan werden mindestens exakt nachbewertet
+INT8_MIN_CANDIDATES = 32
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _dot_scan(matrix, query):
+        """Row-parallel dot products of the normalized matrix with the normalized query."""
+        n, d = matrix.shape
+        out = np.empty(n, np.float32)
+        for i in prange(n):
+            s = np.float32(0.0)
+            for j in range(d):
+                s += matrix[i, j] * query[j]
+            out[i] = s
+        return out
+
+
+def _pack_embedding(vec: np.ndarray) -> bytes:
+    """Serialize an embedding as raw float32 bytes for the BLOB column."""
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def _unpack_embedding(blob: Any, dim: Optional[int] = None) -> np.ndarray:
+    """Deserialize a stored embedding; rows written before the BLOB format hold a JSON list."""
+    if isinstance(blob, str):
+        return np.array(json.loads(blob), dtype=np.float32)
+    return np.frombuffer(blob, dtype=np.float32, count=dim or -1)
+
+
+class _CachedConnection:
+    """One lazily opened SQLite connection per instance, shared across threads under a lock."""
+    
+    db_path: str
+    _conn: Optional[sqlite3.Connection] = None
+    
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Yield the cached autocommit connection; access is serialized across threads."""
+        with self._conn_lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA cache_size=-65536")
+                conn.execute("PRAGMA temp_store=MEMORY")
+                conn.execute("PRAGMA mmap_size=268435456")
+                self._conn = conn
+            yield self._conn
+    
+    def close(self):
+        """Close the cached connection; the next access reopens it."""
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
-class CliniqVectorStore:
+
+class CliniqVectorStore(_CachedConnection):
     """Vector embeddings and similarity search for medical cases."""
     
+    # Das Modell wird einmal pro Prozess geladen und von allen Instanzen geteilt;
+    # False merkt sich einen fehlgeschlagenen Ladeversuch
+    _model_cache = None
+    _model_lock = threading.Lock()
+    
     def __init__(self, db_path: str = "cliniq_data.db"):
         self.db_path = db_path
+        self._conn_lock = threading.Lock()
         # Verwende ein medizinisches Sentence Transformer Model
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
-            try:
-                self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            except:
-                print("Warning: Could not load sentence transformer model.")
-                self.model = None
-        else:
+        self.model = self._get_model()
+        
+        # LRU-Cache Fallbeschreibung (blake2b) → Embedding, geteilt zwischen Hintergrund-Threads
+        self._encode_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._encode_lock = threading.Lock()
+        # Serialisiert das Laden und Fortschreiben der Matrix-Datei
+        self._matrix_lock = threading.Lock()
+        # (Signatur, Dimension, content_ids, normalisierte Matrix, Epoche) der zuletzt geladenen Embeddings;
+        # die Epoche wechselt nur, wenn die neue Matrix nicht durch Anhängen aus der alten entstanden ist
+        self._matrix_cache: Optional[Tuple[Tuple[int, int], int, np.ndarray, np.ndarray, int]] = None
+        self._matrix_epoch = 0
+        # (Epoche, Zeilen, HNSW-Index) - angehängte Zeilen werden nachgetragen, neu gebaut nur bei neuer Epoche
+        self._hnsw_cache: Optional[Tuple[int, int, Any]] = None
+        # (Epoche, Zeilen, int8-Puffer) für den SimSIMD-Vorscan; der Puffer wächst beim Anhängen mit
+        self._int8_cache: Optional[Tuple[int, int, np.ndarray]] = None
+    
+    @classmethod
+    def _get_model(cls):
+        """Return the shared sentence transformer, loading it on first use (None if unavailable)."""
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
             print("Info: sentence-transformers not available. Using simple embeddings.")
-            self.model = None
+            return None
+        
+        with cls._model_lock:
+            if cls._model_cache is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    if "OMP_NUM_THREADS" not in os.environ:
+                        # Intra-op-Threads für den Encoder begrenzen, sofern kein eigenes Limit gesetzt ist
+                        import torch
+                        torch.set_num_threads(min(8, os.cpu_count() or 1))
+                    device = cls._detect_device()
+                    model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+                    if device == "cuda":
+                        # fp16 halbiert Speicher und Latenz auf der GPU; Ähnlichkeiten bleiben praktisch gleich
+                        model.half()
+                    cls._model_cache = model
+                except Exception:
+                    print("Warning: Could not load sentence transformer model.")
+                    # Nicht bei jeder neuen Instanz erneut laden/herunterladen
+                    cls._model_cache = False
+            return cls._model_cache or None
+    
+    @staticmethod
+    def _detect_device() -> str:
+        """Pick the fastest available torch device."""
+        try:
+            import torch
+            if torch.cuda.is_available():
+                return "cuda"
+            if torch.backends.mps.is_available():
+                return "mps"
+        except Exception:
+            pass
+        return "cpu"
     
     def create_case_embedding(self, patient_data: Dict[str, Any], lab_result: Dict[str, Any]) -> np.ndarray:
         """Create embedding vector for a medical case."""
+        return self.create_case_embeddings([(patient_data, lab_result)])[0]
+    
+    def create_case_embeddings(self, cases: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> np.ndarray:
+        """Create embedding vectors for several cases with one batched model call."""
         if not self.model:
-            # Fallback: Simple feature vector
-            return self._create_simple_embedding(patient_data, lab_result)
+            # Fallback: Simple feature vector, wie die Modell-Embeddings auf Länge 1 normiert
+            features = np.vstack([self._create_simple_embedding(patient_data, lab_result)
+                                  for patient_data, lab_result in cases])
+            norms = np.linalg.norm(features, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return features / norms
         
-        # Erstelle Textbeschreibung des Falls
-        case_text = self._create_case_description(patient_data, lab_result)
+        # Erstelle Textbeschreibungen der Fälle
+        case_texts = [self._create_case_description(patient_data, lab_result) for patient_data, lab_result in cases]
         
-        # Generiere Embedding
-        embedding = self.model.encode([case_text])[0]
-        return embedding
+        return self._encode_texts(case_texts)
+    
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, reusing cached embeddings and batching only the misses."""
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._encode_lock:
+            for i, key in enumerate(keys):
+                cached = self._encode_cache.get(key)
+                if cached is not None:
+                    self._encode_cache.move_to_end(key)
+                    embeddings[i] = cached
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # Generiere alle fehlenden Embeddings in einem Durchlauf
+            encoded = self.model.encode([texts[i] for i in missing], batch_size=ENCODE_BATCH_SIZE,
+                                        convert_to_numpy=True, normalize_embeddings=True)
+            with self._encode_lock:
+                for i, embedding in zip(missing, encoded):
+                    embeddings[i] = embedding
+                    self._encode_cache[keys[i]] = embedding
+                while len(self._encode_cache) > ENCODE_CACHE_SIZE:
+                    self._encode_cache.popitem(last=False)
+        
+        return np.vstack(embeddings)
     
     def _create_case_description(self, patient_data: Dict[str, Any], lab_result: Dict[str, Any]) -> str:
         """Create a text description of the medical case for embedding."""
-        description_parts = []
-        
-        # Patient info
-        description_parts.append(f"Patient: {patient_data['patient_data']['age']} Jahre, {patient_data['patient_data']['gender']}")
-        description_parts.append(f"MTS-Kategorie: {patient_data['patient_data']['mts_category']}")
-        
-        # Diagnosis
-        description_parts.append(f"Verdachtsdiagnose: {patient_data['clinical_data']['suspected_diagnosis']}")
+        patient = patient_data['patient_data']
+        clinical = patient_data['clinical_data']
+        vitals = patient_data['vital_signs']
         
-        # Symptoms
-        description_parts.append(f"Symptomdauer: {patient_data['clinical_data']['symptom_duration']}")
-        description_parts.append(f"Schmerzen: {patient_data['clinical_data']['pain_scale']}/10")
+        # Patient, Diagnose und Symptome
+        description = (
+            f"Patient: {patient['age']} Jahre, {patient['gender']} | "
+            f"MTS-Kategorie: {patient['mts_category']} | "
+            f"Verdachtsdiagnose: {clinical['suspected_diagnosis']} | "
+            f"Symptomdauer: {clinical['symptom_duration']} | "
+            f"Schmerzen: {clinical['pain_scale']}/10"
+        )
         
         # Comorbidities
-        if patient_data['clinical_data']['comorbidities']:
-            description_parts.append(f"Vorerkrankungen: {', '.join(patient_data['clinical_data']['comorbidities'])}")
+        if clinical['comorbidities']:
+            description += f" | Vorerkrankungen: {', '.join(clinical['comorbidities'])}"
         
         # Vital signs
-        vitals = patient_data['vital_signs']
-        description_parts.append(f"Blutdruck: {vitals['blood_pressure']} mmHg")
-        description_parts.append(f"Puls: {vitals['heart_rate']} bpm")
-        description_parts.append(f"Temperatur: {vitals['temperature']}°C")
-        description_parts.append(f"SpO2: {vitals['oxygen_saturation']}%")
+        description += (
+            f" | Blutdruck: {vitals['blood_pressure']} mmHg | Puls: {vitals['heart_rate']} bpm"
+            f" | Temperatur: {vitals['temperature']}°C | SpO2: {vitals['oxygen_saturation']}%"
+        )
         
         # Lab values
         if lab_result.get('laboratory_values'):
-            description_parts.append(f"Laborwerte: {', '.join(lab_result['laboratory_values'])}")
+            description += f" | Laborwerte: {', '.join(lab_result['laboratory_values'])}"
         
         # Reasoning
         if lab_result.get('reasoning'):
-            description_parts.append(f"Begründung: {lab_result['reasoning']}")
+            description += f" | Begründung: {lab_result['reasoning']}"
         
-        return " | ".join(description_parts)
+        return description
     
     def _create_simple_embedding(self, patient_data: Dict[str, Any], lab_result: Dict[str, Any]) -> np.ndarray:
         """Create a simple feature vector when sentence transformers are not available."""
-        features = []
+        # Fester Vektor der Länge 50, ungenutzte Stellen bleiben 0
+        features = np.zeros(50, dtype=np.float32)
+        patient = patient_data['patient_data']
+        vitals = patient_data['vital_signs']
         
         # Age (normalized)
-        features.append(patient_data['patient_data']['age'] / 100.0)
+        features[0] = patient['age'] / 100.0
         
         # Gender (one-hot)
-        gender = patient_data['patient_data']['gender']
-        features.extend([1.0 if gender == 'Männlich (m)' else 0.0])
-        features.extend([1.0 if gender == 'Weiblich (w)' else 0.0])
+        gender = patient['gender']
+        features[1] = 1.0 if gender == 'Männlich (m)' else 0.0
+        features[2] = 1.0 if gender == 'Weiblich (w)' else 0.0
         
         # MTS category (encoded)
         mts_map = {'red': 5, 'orange': 4, 'yellow': 3, 'green': 2, 'blue': 1}
-        features.append(mts_map.get(patient_data['patient_data']['mts_category'], 0) / 5.0)
+        features[3] = mts_map.get(patient['mts_category'], 0) / 5.0
         
         # Vital signs (normalized)
-        vitals = patient_data['vital_signs']
-        features.extend([
-            vitals['systolic_bp'] / 200.0,
-            vitals['diastolic_bp'] / 120.0,
-            vitals['heart_rate'] / 200.0,
-            vitals['temperature'] / 42.0,
-            vitals['respiratory_rate'] / 60.0,
-            vitals['oxygen_saturation'] / 100.0
-        ])
+        features[4] = vitals['systolic_bp'] / 200.0
+        features[5] = vitals['diastolic_bp'] / 120.0
+        features[6] = vitals['heart_rate'] / 200.0
+        features[7] = vitals['temperature'] / 42.0
+        features[8] = vitals['respiratory_rate'] / 60.0
+        features[9] = vitals['oxygen_saturation'] / 100.0
         
         # Pain scale
-        features.append(patient_data['clinical_data']['pain_scale'] / 10.0)
+        features[10] = patient_data['clinical_data']['pain_scale'] / 10.0
         
         # Lab values count
-        lab_count = len(lab_result.get('laboratory_values', []))
-        features.append(lab_count / 20.0)  # Assuming max 20 lab values
+        features[11] = len(lab_result.get('laboratory_values', [])) / 20.0  # Assuming max 20 lab values
         
         # Cost efficiency
-        features.append(lab_result.get('cost_efficiency', 0) / 5.0)
-        
-        # Pad to fixed length
-        while len(features) < 50:
-            features.append(0.0)
+        features[12] = lab_result.get('cost_efficiency', 0) / 5.0
         
-        return np.array(features[:50])
+        return features
     
     def _simple_cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """Simple cosine similarity implementation."""
-        dot_product = np.dot(vec1, vec2)
-        norm_a = np.linalg.norm(vec1)
-        norm_b = np.linalg.norm(vec2)
-        
-        if norm_a == 0 or norm_b == 0:
+        # Ein sqrt über das Produkt der Quadratsummen statt zwei np.linalg.norm-Aufrufen
+        denominator = np.sqrt(np.vdot(vec1, vec1) * np.vdot(vec2, vec2))
+        if denominator == 0:
             return 0.0
         
-        return dot_product / (norm_a * norm_b)
+        return float(np.dot(vec1, vec2) / denominator)
+    
+    def _load_embedding_matrix(self, dim: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Load all order embeddings of dimension ``dim`` as one contiguous (N, D) matrix.
+        
+        Embeddings are stored unit-length; rows are normalized again here for older
+        databases. The matrix is persisted to a memory-mapped file next to the database,
+        so later loads and other processes skip BLOB decoding. New embeddings are
+        appended to that file. It is rebuilt when rows were removed, when its header
+        names another ``database_id`` or when its last row no longer matches the BLOB.
+        
+        Returns ``(ids, matrix, epoch)``; rows are append-only within one epoch, so
+        derived indexes only need the rows past their own length.
+        """
+        with self._matrix_lock, self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), MAX(id) FROM embeddings WHERE content_type = 'order'")
+            signature = tuple(cursor.fetchone())
+            
+            cached = self._matrix_cache
+            if cached is not None and cached[0] == signature and cached[1] == dim:
+                return cached[2], cached[3], cached[4]
+            
+            database_id = self._database_id(cursor)
+            stored = self._read_matrix_file(dim, database_id)
+            if stored is not None and not self._matches_database(cursor, dim, stored):
+                stored = None
+            if stored is not None and stored[0] == signature:
+                # Von einer anderen Instanz geschrieben: Herkunft unbekannt, abgeleitete Indizes neu bauen
+                self._matrix_epoch += 1
+                self._matrix_cache = (signature, dim, stored[1], stored[2], self._matrix_epoch)
+                return stored[1], stored[2], self._matrix_epoch
+            
+            # Nur anhängen, wenn seit dem Schreiben der Datei keine Zeilen gelöscht wurden
+            if stored is not None and stored[0][1] is not None and (signature[1] or 0) > stored[0][1]:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM embeddings WHERE content_type = 'order' AND id <= ?", (stored[0][1],)
+                )
+                if cursor.fetchone()[0] != stored[0][0]:
+                    stored = None
+            else:
+                stored = None
+            after_id = stored[0][1] if stored is not None else 0
+            
+            cursor.execute("""
+                SELECT content_id, embedding_vector, embedding_dim
+                FROM embeddings
+                WHERE content_type = 'order' AND id > ?
+                ORDER BY id
+            """, (after_id,))
+            # Zeilen blockweise direkt in die vorab angelegte Matrix schreiben statt fetchall()
+            expected = signature[0] - (stored[0][0] if stored is not None else 0)
+            new_rows = np.empty((expected, dim), dtype=np.float32)
+            new_ids = np.empty(expected, dtype=np.int64)
+            n = 0
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                for content_id, embedding_blob, embedding_dim in rows:
+                    vector = _unpack_embedding(embedding_blob, embedding_dim)
+                    if len(vector) == dim and n < len(new_rows):
+                        new_rows[n] = vector
+                        new_ids[n] = content_id
+                        n += 1
+            
+            new_rows = new_rows[:n]
+            new_ids = new_ids[:n]
+            norms = np.linalg.norm(new_rows, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            new_rows /= norms
+            
+            ids_array, matrix = self._write_matrix_file(dim, database_id, signature, new_ids, new_rows, stored)
+            
+            # Nur an genau den bisher gecachten Stand angehängt: Epoche bleibt
+            if not (stored is not None and cached is not None and cached[1] == dim and cached[0] == stored[0]):
+                self._matrix_epoch += 1
+            self._matrix_cache = (signature, dim, ids_array, matrix, self._matrix_epoch)
+            return ids_array, matrix, self._matrix_epoch
+    
+    @staticmethod
+    def _database_id(cursor: sqlite3.Cursor) -> Optional[str]:
+        """Random id of the database file (``meta.database_id``); None for databases without it."""
+        try:
+            row = cursor.execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+    
+    @staticmethod
+    def _matches_database(cursor: sqlite3.Cursor, dim: int, stored: Tuple[Any, np.ndarray, np.ndarray]) -> bool:
+        """Spot-check the file's last row against the newest matching BLOB it claims to cover."""
+        signature, ids, matrix = stored
+        if len(ids) == 0:
+            return True
+        cursor.execute("""
+            SELECT content_id, embedding_vector, embedding_dim
+            FROM embeddings
+            WHERE content_type = 'order' AND id <= ? AND embedding_dim = ?
+            ORDER BY id DESC
+            LIMIT 1
+        """, (signature[1], dim))
+        row = cursor.fetchone()
+        if row is None or row[0] != ids[-1]:
+            return False
+        vector = _unpack_embedding(row[1], row[2])
+        norm = np.linalg.norm(vector)
+        return bool(np.allclose(vector / (norm or 1.0), matrix[-1], atol=1e-6))
+    
+    def _matrix_file_paths(self, dim: int) -> Optional[Tuple[str, str]]:
+        """Paths of the float32 matrix file and its id sidecar; None for in-memory databases."""
+        if self.db_path == ":memory:":
+            return None
+        base = f"{self.db_path}.emb{dim}"
+        return base + ".f32", base + ".ids"
+    
+    def _read_matrix_file(self, dim: int, database_id: Optional[str]
+                          ) -> Optional[Tuple[Tuple[int, Optional[int]], np.ndarray, np.ndarray]]:
+        """Open the persisted matrix read-only as (signature, ids, memmap).
+        
+        None if the file is missing or torn, or was written for another database.
+        """
+        paths = self._matrix_file_paths(dim)
+        if paths is None or database_id is None:
+            return None
+        matrix_path, ids_path = paths
+        try:
+            # Sidecar: [database_id (2 Wörter), Anzahl, MAX(id) bzw. -1], danach die content_ids
+            header_ids = np.fromfile(ids_path, dtype=np.int64)
+            if len(header_ids) < MATRIX_HEADER_WORDS:
+                return None
+            if header_ids[:2].tobytes() != bytes.fromhex(database_id):
+                return None
+            ids = header_ids[MATRIX_HEADER_WORDS:]
+            if os.path.getsize(matrix_path) != len(ids) * dim * 4:
+                return None
+            if len(ids) == 0:
+                matrix = np.empty((0, dim), dtype=np.float32)
+            else:
+                matrix = np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(len(ids), dim))
+        except (OSError, ValueError):
+            return None
+        
+        signature = (int(header_ids[2]), None if header_ids[3] < 0 else int(header_ids[3]))
+        return signature, ids, matrix
+    
+    def _write_matrix_file(self, dim: int, database_id: Optional[str], signature: Tuple[int, Optional[int]],
+                           new_ids: np.ndarray, new_rows: np.ndarray,
+                           stored: Optional[Tuple[Any, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Append (or, without ``stored``, rewrite) the matrix file and return the reopened arrays."""
+        paths = self._matrix_file_paths(dim)
+        if paths is not None and database_id is not None:
+            matrix_path, ids_path = paths
+            header = np.frombuffer(bytes.fromhex(database_id), dtype=np.int64).tobytes() + np.array(
+                [signature[0], -1 if signature[1] is None else signature[1]], dtype=np.int64
+            ).tobytes()
+            try:
+                if stored is not None:
+                    # Anhängen lässt bestehende Memmaps (laufende Abfragen) gültig
+                    with open(matrix_path, "ab") as f:
+                        f.write(new_rows.tobytes())
+                    with open(ids_path, "r+b") as f:
+                        f.write(header)
+                        f.seek(0, os.SEEK_END)
+                        f.write(new_ids.tobytes())
+                else:
+                    # Neu schreiben über Ersetzen statt Kürzen: gemappte alte Dateien bleiben lesbar
+                    for path, data in ((matrix_path, new_rows.tobytes()),
+                                       (ids_path, header + new_ids.tobytes())):
+                        with open(path + ".tmp", "wb") as f:
+                            f.write(data)
+                        os.replace(path + ".tmp", path)
+                reopened = self._read_matrix_file(dim, database_id)
+                if reopened is not None:
+                    return reopened[1], reopened[2]
+            except OSError as e:
+                print(f"Warning: Could not write embedding matrix file: {e}")
+        
+        # Ohne Datei: Matrix nur im Speicher halten
+        if stored is None:
+            return new_ids, new_rows
+        return np.concatenate([stored[1], new_ids]), np.concatenate([stored[2], new_rows])
+    
+    def _hnsw_index(self, matrix: np.ndarray, epoch: int):
+        """Inner-product HNSW index over the normalized matrix.
+        
+        Rows appended within the same epoch are added to the existing index; it is
+        only rebuilt from scratch when the epoch changes. The index may hold more rows
+        than ``matrix`` if another thread loaded a newer matrix in the meantime.
+        """
+        with self._matrix_lock:
+            cached = self._hnsw_cache
+            if cached is not None and cached[0] == epoch:
+                _, n_indexed, index = cached
+            else:
+                index = faiss.IndexHNSWFlat(matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+                index.hnsw.efSearch = 64  # höhere Trefferquote als der Standardwert 16
+                n_indexed = 0
+            
+            if n_indexed < len(matrix):
+                index.add(np.ascontiguousarray(matrix[n_indexed:]))
+                n_indexed = len(matrix)
+            self._hnsw_cache = (epoch, n_indexed, index)
+            return index
+    
+    def _int8_matrix(self, matrix: np.ndarray, epoch: int) -> np.ndarray:
+        """int8 copy of the normalized matrix for the SimSIMD pre-scan.
+        
+        Rows have unit length, so one fixed scale of 127 is enough; cosine ignores
+        the remaining per-row scale anyway. Within one epoch only appended rows are
+        quantized, into a buffer that grows geometrically.
+        """
+        with self._matrix_lock:
+            cached = self._int8_cache
+            if cached is not None and cached[0] == epoch:
+                _, n_quantized, buffer = cached
+            else:
+                buffer = np.empty((len(matrix), matrix.shape[1]), dtype=np.int8)
+                n_quantized = 0
+            
+            if n_quantized < len(matrix):
+                if len(matrix) > len(buffer):
+                    grown = np.empty((max(len(matrix), 2 * len(buffer)), matrix.shape[1]), dtype=np.int8)
+                    grown[:n_quantized] = buffer[:n_quantized]
+                    buffer = grown
+                buffer[n_quantized:len(matrix)] = np.round(matrix[n_quantized:] * 127)
+                n_quantized = len(matrix)
+            self._int8_cache = (epoch, n_quantized, buffer)
+            return buffer[:len(matrix)]
+    
+    def get_similar_cases_vector(self, query_vec: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (content_id, cosine similarity) pairs via one matrix-vector product."""
+        query = np.asarray(query_vec, dtype=np.float32)
+        ids, matrix, epoch = self._load_embedding_matrix(len(query))
+        
+        query_norm = np.linalg.norm(query)
+        if len(ids) == 0 or query_norm == 0:
+            return []
+        
+        if FAISS_AVAILABLE and len(ids) >= HNSW_MIN_ROWS:
+            # Zeilen sind normalisiert: Skalarprodukt = Kosinus-Ähnlichkeit
+            similarities, rows = self._hnsw_index(matrix, epoch).search((query / query_norm)[None, :], k)
+            return [(int(ids[row]), float(score)) for row, score in zip(rows[0], similarities[0])
+                    if 0 <= row < len(ids)]
+        
+        query = query / query_norm
+        if SIMSIMD_AVAILABLE:
+            # Vorauswahl per int8-Scan (cdist liefert Kosinus-Distanzen), danach exakt in float32 bewerten
+            query_int8 = np.round(query * 127).astype(np.int8)
+            distances = np.asarray(simsimd.cdist(query_int8[None, :], self._int8_matrix(matrix, epoch), metric="cosine"))[0]
+            n_candidates = min(len(ids), max(4 * k, INT8_MIN_CANDIDATES))
+            candidates = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+            scores = matrix[candidates] @ query
+        else:
+            candidates = None
+            scores = _dot_scan(matrix, query) if NUMBA_AVAILABLE else matrix @ query
+        
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if candidates is None else candidates[top]
+        return [(int(ids[row]), float(scores[i])) for row, i in zip(rows, top)]
     
     def save_embedding(self, order_id: int, patient_data: Dict[str, Any], lab_result: Dict[str, Any]):
         """Save embedding to database."""
-        embedding = self.create_case_embedding(patient_data, lab_result)
-        
-        metadata = {
-            "diagnosis": patient_data['clinical_data']['suspected_diagnosis'],
-            "age": patient_data['patient_data']['age'],
-            "gender": patient_data['patient_data']['gender'],
-            "mts_category": patient_data['patient_data']['mts_category'],
-            "urgency": lab_result.get('urgency_level', ''),
-            "cost_efficiency": lab_result.get('cost_efficiency', 0)
-        }
+        self.save_embeddings_bulk([(order_id, patient_data, lab_result)])
+    
+    def save_embeddings_bulk(self, items: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]):
+        """Encode and save embeddings for many (order_id, patient_data, lab_result) items at once."""
+        if not items:
+            return
+        
+        embeddings = self.create_case_embeddings([(patient_data, lab_result) for _, patient_data, lab_result in items])
+        
+        rows = []
+        for (order_id, patient_data, lab_result), embedding in zip(items, embeddings):
+            metadata = {
+                "diagnosis": patient_data['clinical_data']['suspected_diagnosis'],
+                "age": patient_data['patient_data']['age'],
+                "gender": patient_data['patient_data']['gender'],
+                "mts_category": patient_data['patient_data']['mts_category'],
+                "urgency": lab_result.get('urgency_level', ''),
+                "cost_efficiency": lab_result.get('cost_efficiency', 0)
+            }
+            rows.append((order_id, 'order', _pack_embedding(embedding), len(embedding), json.dumps(metadata)))
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO embeddings (content_id, content_type, embedding_vector, metadata)
-                VALUES (?, ?, ?, ?)
-            """, (
-                order_id,
-                'order',
-                json.dumps(embedding.tolist()),
-                json.dumps(metadata)
-            ))
-            conn.commit()
+        # Eine Transaktion für alle Zeilen: WAL + synchronous=NORMAL spart das fsync je Zeile
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("""
+                    INSERT INTO embeddings (content_id, content_type, embedding_vector, embedding_dim, metadata)
+                    VALUES (?, ?, ?, ?, ?)
+                """, rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                # Auch bei KeyboardInterrupt oder fehlgeschlagenem COMMIT (SQLITE_BUSY):
+                # die geteilte Verbindung nie in einer offenen Transaktion zurücklassen
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
     
     def find_similar_cases(self, patient_data: Dict[str, Any], lab_result: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
         """Find similar cases using vector similarity."""
         query_embedding = self.create_case_embedding(patient_data, lab_result)
         
-        with sqlite3.connect(self.db_path) as conn:
+        # Top-k über die gecachte Matrix; nur diese Bestellungen werden nachgeladen
+        top = self.get_similar_cases_vector(query_embedding, k=limit)
+        if not top:
+            return []
+        
+        placeholders = ", ".join("?" * len(top))
+        with self._connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT e.content_id, e.embedding_vector, e.metadata,
-                       lo.diagnosis, lo.laboratory_values, lo.reasoning, lo.cost_efficiency
-                FROM embeddings e
-                JOIN laboratory_orders lo ON e.content_id = lo.id
-                WHERE e.content_type = 'order'
-            """)
-            
-            results = []
-            for row in cursor.fetchall():
-                content_id, embedding_str, metadata_str, diagnosis, lab_values, reasoning, cost_eff = row
-                
-                # Lade Embedding
-                stored_embedding = np.array(json.loads(embedding_str))
-                metadata = json.loads(metadata_str)
-                
-                # Berechne Ähnlichkeit
-                if SKLEARN_AVAILABLE:
-                    similarity = cosine_similarity([query_embedding], [stored_embedding])[0][0]
-                else:
-                    # Simple cosine similarity implementation
-                    similarity = self._simple_cosine_similarity(query_embedding, stored_embedding)
-                
-                results.append({
-                    'order_id': content_id,
-                    'similarity': float(similarity),
-                    'metadata': metadata,
-                    'diagnosis': diagnosis,
-                    'laboratory_values': json.loads(lab_values) if lab_values else [],
-                    'reasoning': reasoning,
-                    'cost_efficiency': cost_eff
-                })
-            
-            # Sortiere nach Ähnlichkeit
-            results.sort(key=lambda x: x['similarity'], reverse=True)
-            return results[:limit]
+            cursor.execute(f"""
+                SELECT lo.id, e.metadata, lo.diagnosis, lo.laboratory_values, lo.reasoning, lo.cost_efficiency
+                FROM laboratory_orders lo
+                JOIN embeddings e ON e.content_id = lo.id AND e.content_type = 'order'
+                WHERE lo.id IN ({placeholders})
+            """, [content_id for content_id, _ in top])
+            rows = {row[0]: row[1:] for row in cursor.fetchall()}
+        
+        results = []
+        for content_id, similarity in top:
+            if content_id not in rows:
+                continue
+            metadata_str, diagnosis, lab_values, reasoning, cost_eff = rows[content_id]
+            results.append({
+                'order_id': content_id,
+                'similarity': similarity,
+                'metadata': json.loads(metadata_str),
+                'diagnosis': diagnosis,
+                'laboratory_values': json.loads(lab_values) if lab_values else [],
+                'reasoning': reasoning,
+                'cost_efficiency': cost_eff
+            })
+        return results
     
     def get_recommendations(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get AI recommendations based on similar cases."""
@@ -234,47 +665,49 @@ class CliniqVectorStore:
                 all_tests.extend(case['laboratory_values'])
         
         # Zähle Test-Häufigkeiten
-        test_counts = {}
-        for test in all_tests:
-            test_counts[test] = test_counts.get(test, 0) + 1
+        test_counts = Counter(all_tests)
         
-        # Empfehle Tests basierend auf Häufigkeit
+        # Empfehle Tests basierend auf Häufigkeit (nur die Top 10 statt voller Sortierung)
         total_cases = len(high_similarity_cases) if high_similarity_cases else len(similar_cases)
         recommended_tests = []
         
-        for test, count in sorted(test_counts.items(), key=lambda x: x[1], reverse=True):
+        for test, count in test_counts.most_common(10):
             confidence = count / total_cases if total_cases > 0 else 0
-            if confidence >= 0.3:  # Mindestens 30% der ähnlichen Fälle
-                recommended_tests.append({
-                    "test": test,
-                    "confidence": confidence,
-                    "frequency": count,
-                    "total_cases": total_cases
-                })
+            if confidence < 0.3:  # Mindestens 30% der ähnlichen Fälle; absteigend sortiert
+                break
+            recommended_tests.append({
+                "test": test,
+                "confidence": confidence,
+                "frequency": count,
+                "total_cases": total_cases
+            })
         
         # Erstelle Begründung
-        avg_similarity = sum(case['similarity'] for case in similar_cases[:5]) / min(5, len(similar_cases))
+        avg_similarity = float(np.mean([case['similarity'] for case in similar_cases[:5]]))
         
         reasoning = f"Basierend auf {len(similar_cases)} ähnlichen Fällen (Ø Ähnlichkeit: {avg_similarity:.2f}). "
         reasoning += f"Top-Empfehlungen aus {total_cases} hochähnlichen Fällen."
         
         return {
-            "recommended_tests": recommended_tests[:10],  # Top 10
+            "recommended_tests": recommended_tests,  # Top 10
             "confidence": float(avg_similarity),
             "reasoning": reasoning,
             "similar_cases_count": len(similar_cases),
             "similar_cases": similar_cases[:3]  # Top 3 für Anzeige
         }
 
-class CliniqAnalytics:
+class CliniqAnalytics(_CachedConnection):
     """Analytics and insights for laboratory orders."""
     
     def __init__(self, db_path: str = "cliniq_data.db"):
         self.db_path = db_path
+        self._conn_lock = threading.Lock()
     
     def get_efficiency_trends(self) -> Dict[str, Any]:
         """Get cost efficiency trends over time."""
-        with sqlite3.connect(self.db_path) as conn:
+        import pandas as pd
+        
+        with self._connection() as conn:
             df = pd.read_sql_query("""
                 SELECT 
                     DATE(timestamp) as date,
@@ -306,43 +739,66 @@ class CliniqAnalytics:
     
     def get_diagnosis_insights(self) -> Dict[str, Any]:
         """Get insights by diagnosis."""
-        with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query("""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
                 SELECT 
                     diagnosis,
                     COUNT(*) as frequency,
                     AVG(cost_efficiency) as avg_efficiency,
                     AVG(patient_age) as avg_age,
-                    urgency_level,
-                    laboratory_values
+                    urgency_level
                 FROM laboratory_orders 
                 GROUP BY diagnosis
                 ORDER BY frequency DESC
-            """, conn)
-            
-            insights = []
-            for _, row in df.iterrows():
-                lab_values = json.loads(row['laboratory_values']) if row['laboratory_values'] else []
-                insights.append({
-                    "diagnosis": row['diagnosis'],
-                    "frequency": int(row['frequency']),
-                    "avg_efficiency": float(row['avg_efficiency']),
-                    "avg_age": float(row['avg_age']),
-                    "common_tests": lab_values[:5],  # Top 5 tests
-                    "urgency": row['urgency_level']
-                })
+            """)
+            rows = cursor.fetchall()
             
-            return {"insights": insights}
+            # Häufigste Tests je Diagnose direkt in SQL über die JSON-Arrays auszählen
+            cursor.execute("""
+                SELECT diagnosis, test
+                FROM (
+                    SELECT 
+                        lo.diagnosis,
+                        j.value as test,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY lo.diagnosis ORDER BY COUNT(*) DESC, j.value
+                        ) as rank
+                    FROM laboratory_orders lo, json_each(lo.laboratory_values) j
+                    WHERE json_valid(lo.laboratory_values)
+                    GROUP BY lo.diagnosis, j.value
+                )
+                WHERE rank <= ?
+                ORDER BY diagnosis, rank
+            """, (5,))
+            common_tests: Dict[Any, List[str]] = {}
+            for diagnosis, test in cursor.fetchall():
+                common_tests.setdefault(diagnosis, []).append(test)
+        
+        insights = []
+        for diagnosis, frequency, avg_efficiency, avg_age, urgency in rows:
+            insights.append({
+                "diagnosis": diagnosis,
+                "frequency": int(frequency),
+                "avg_efficiency": float(avg_efficiency or 0),
+                "avg_age": float(avg_age or 0),
+                "common_tests": common_tests.get(diagnosis, []),  # Top 5 tests
+                "urgency": urgency
+            })
+        
+        return {"insights": insights}
     
     def get_real_time_dashboard_data(self) -> Dict[str, Any]:
         """Get real-time dashboard data."""
-        with sqlite3.connect(self.db_path) as conn:
+        import pandas as pd
+        
+        with self._connection() as conn:
             # Heute's Statistiken
             today_stats = pd.read_sql_query("""
                 SELECT 
                     COUNT(*) as today_orders,
-                    AVG(cost_efficiency) as today_efficiency,
-                    SUM(CASE WHEN cost_efficiency >= 4 THEN 1 ELSE 0 END) as efficient_orders
+                    COALESCE(AVG(cost_efficiency), 0) as today_efficiency,
+                    COALESCE(SUM(CASE WHEN cost_efficiency >= 4 THEN 1 ELSE 0 END), 0) as efficient_orders
                 FROM laboratory_orders 
                 WHERE DATE(timestamp) = DATE('now')
             """, conn).iloc[0]
@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from my_package.database import SCHEMA_VERSION, CliniqDatabase
+
+
+# Schema vor der Einführung von user_version (JSON-Embeddings, Vitalwerte nur als JSON)
+BASELINE_SCHEMA = """
+    CREATE TABLE laboratory_orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        patient_age INTEGER,
+        patient_gender TEXT,
+        mts_category TEXT,
+        diagnosis TEXT,
+        comorbidities TEXT,
+        vital_signs TEXT,
+        symptom_duration TEXT,
+        pain_scale INTEGER,
+        additional_notes TEXT,
+        laboratory_values TEXT,
+        reasoning TEXT,
+        estimated_duration TEXT,
+        urgency_level TEXT,
+        cost_efficiency INTEGER,
+        quality_check TEXT,
+        session_id TEXT
+    );
+    CREATE TABLE laboratory_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        parameter_name TEXT,
+        value REAL,
+        unit TEXT,
+        reference_min REAL,
+        reference_max REAL,
+        status TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (order_id) REFERENCES laboratory_orders (id)
+    );
+    CREATE TABLE analysis_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        analysis_type TEXT,
+        analysis_data TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE embeddings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_id INTEGER,
+        content_type TEXT,
+        embedding_vector TEXT,
+        metadata TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+VITALS = {"blood_pressure": "135/85", "systolic_bp": 135, "diastolic_bp": 85, "heart_rate": 104,
+          "temperature": 38.6, "respiratory_rate": 22, "oxygen_saturation": 94}
+
+
+def make_case(age=45, diagnosis="Pneumonie"):
+    return {
+        "patient_data": {"age": age, "gender": "Weiblich (w)", "mts_category": "gelb"},
+        "clinical_data": {
+            "suspected_diagnosis": diagnosis,
+            "comorbidities": [],
+            "symptom_duration": "1-3 Tage",
+            "pain_scale": 3,
+            "additional_notes": "",
+        },
+        "vital_signs": dict(VITALS),
+    }
+
+
+class DatabaseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "cliniq.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class TestSchemaMigration(DatabaseTestCase):
+
+    def create_baseline_database(self, vector):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(BASELINE_SCHEMA)
+            conn.execute(
+                "INSERT INTO laboratory_orders (timestamp, patient_age, diagnosis, vital_signs, cost_efficiency) "
+                "VALUES ('2024-03-05 10:15:00', 61, 'Sepsis', ?, 3)",
+                (json.dumps(VITALS),)
+            )
+            conn.execute(
+                "INSERT INTO embeddings (content_id, content_type, embedding_vector, metadata) "
+                "VALUES (1, 'order', ?, '{}')",
+                (json.dumps(vector),)
+            )
+
+    def test_baseline_database_is_upgraded(self):
+        vector = [0.25, -1.5, 3.0, 0.0]
+        self.create_baseline_database(vector)
+
+        db = CliniqDatabase(self.db_path)
+        db.close()
+
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+
+            # JSON-Embeddings → float32-BLOB mit Dimension
+            blob_type, blob, dim = conn.execute(
+                "SELECT typeof(embedding_vector), embedding_vector, embedding_dim FROM embeddings"
+            ).fetchone()
+            self.assertEqual(blob_type, "blob")
+            self.assertEqual(dim, len(vector))
+            np.testing.assert_array_equal(np.frombuffer(blob, dtype=np.float32), np.float32(vector))
+
+            # Vitalwerte aus dem JSON in die typisierten Spalten übernommen
+            row = conn.execute(
+                "SELECT systolic_bp, diastolic_bp, heart_rate, temperature, respiratory_rate, "
+                "oxygen_saturation, date_day FROM laboratory_orders"
+            ).fetchone()
+            self.assertEqual(row[:6], (135, 85, 104, 38.6, 22, 94))
+            self.assertEqual(row[6], "2024-03-05")
+
+            database_id = conn.execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone()[0]
+
+        # Zweites Öffnen überspringt die DDL und lässt Daten und Kennung unverändert
+        CliniqDatabase(self.db_path).close()
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(
+                conn.execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone()[0], database_id
+            )
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM laboratory_orders").fetchone()[0], 1)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0], 1)
+
+
+class TestCostAnalysis(DatabaseTestCase):
+
+    def test_empty_database(self):
+        db = CliniqDatabase(self.db_path)
+        self.assertEqual(db.get_cost_analysis(), {
+            "total_orders": 0,
+            "avg_efficiency": 0,
+            "efficiency_rate": 0,
+            "cost_savings": 0,
+            "trend_data": []
+        })
+        db.close()
+
+    def test_matches_baseline_totals(self):
+        db = CliniqDatabase(self.db_path)
+        # (Tage zurück, cost_efficiency); der Eintrag vor 40 Tagen liegt außerhalb des Fensters
+        orders = [(0, 5), (0, 4), (0, 2), (2, 3), (2, 4), (5, 1), (40, 5)]
+        for days_ago, efficiency in orders:
+            order_id = db.save_laboratory_order(make_case(), {"cost_efficiency": efficiency}, "test")
+            with db._transaction() as conn:
+                conn.execute(
+                    "UPDATE laboratory_orders SET timestamp = datetime('now', ?) WHERE id = ?",
+                    (f"-{days_ago} days", order_id)
+                )
+
+        analysis = db.get_cost_analysis()
+        db.close()
+
+        recent = [efficiency for days_ago, efficiency in orders if days_ago <= 30]
+        efficient = sum(1 for efficiency in recent if efficiency >= 4)
+        self.assertEqual(analysis["total_orders"], len(recent))
+        self.assertAlmostEqual(analysis["avg_efficiency"], sum(recent) / len(recent))
+        self.assertAlmostEqual(analysis["efficiency_rate"], efficient / len(recent) * 100)
+        self.assertAlmostEqual(analysis["cost_savings"], efficient * 25 * 0.3)
+
+        # Tagesverlauf wie bisher: neuester Tag zuerst, je Tag Anzahl, Mittelwert und effiziente Bestellungen
+        by_day = {}
+        for days_ago, efficiency in orders:
+            if days_ago <= 30:
+                by_day.setdefault(days_ago, []).append(efficiency)
+        expected = [
+            (len(values), sum(values) / len(values), sum(1 for value in values if value >= 4))
+            for _, values in sorted(by_day.items())
+        ]
+        actual = [
+            (day["total_orders"], day["avg_efficiency"], day["efficient_orders"])
+            for day in analysis["trend_data"]
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_write_during_query_is_not_cached(self):
+        db = CliniqDatabase(self.db_path)
+        query = db._query_cost_analysis
+
+        def query_then_write():
+            # Ein Schreibvorgang, der nach dem Lesen, aber vor dem Ablegen im Cache committet
+            result = query()
+            db.save_laboratory_order(make_case(), {"cost_efficiency": 5}, "test")
+            return result
+
+        db._query_cost_analysis = query_then_write
+        self.assertEqual(db.get_cost_analysis()["total_orders"], 0)
+        db._query_cost_analysis = query
+
+        self.assertEqual(db.get_cost_analysis()["total_orders"], 1)
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
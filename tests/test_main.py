@@ -1,11 +1,17 @@
+import io
 import unittest
-from my_package.main import your_function  # Replace 'your_function' with the actual function you want to test
+from contextlib import redirect_stdout
+
+from my_package.main import main
+
 
 class TestMain(unittest.TestCase):
 
-    def test_your_function(self):
-        # Replace the following with actual test cases
-        self.assertEqual(your_function(args), expected_result)
+    def test_main_prints_greeting(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main()
+        self.assertEqual(output.getvalue(), "Hello, World!\n")
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
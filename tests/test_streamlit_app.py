@@ -0,0 +1,132 @@
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import orjson
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "my_package")
+
+app = None
+_tmp = None
+_cwd = None
+
+
+def setUpModule():
+    # Die App importiert database/vector_store flach und öffnet cliniq_data.db relativ zum
+    # Arbeitsverzeichnis: für die Dauer der Tests in ein leeres Verzeichnis wechseln
+    global app, _tmp, _cwd
+    _tmp = tempfile.TemporaryDirectory()
+    _cwd = os.getcwd()
+    os.chdir(_tmp.name)
+    sys.path.insert(0, PACKAGE_DIR)
+    app = importlib.import_module("streamlit_app")
+
+
+def tearDownModule():
+    os.chdir(_cwd)
+    sys.path.remove(PACKAGE_DIR)
+    _tmp.cleanup()
+
+
+def make_patient_data(age=52, heart_rate=96, temperature=38.4, systolic_bp=142):
+    return app.create_laboratory_json(
+        "orange", "Weiblich (w)", age, "Pneumonie", ["COPD/Asthma"], "1-3 Tage", 4, "",
+        systolic_bp, 88, heart_rate, temperature, 22, 93
+    )
+
+
+LAB_RESULT = {"laboratory_values": ["CRP", "Blutbild"], "reasoning": "Test", "urgency_level": "hoch"}
+
+
+class TestParseAzureEndpoint(unittest.TestCase):
+
+    def test_full_endpoint(self):
+        self.assertEqual(
+            app._parse_azure_endpoint(
+                "https://cliniq.openai.azure.com/openai/deployments/gpt-4o/chat/completions?api-version=2024-06-01"
+            ),
+            ("https://cliniq.openai.azure.com", "gpt-4o", "2024-06-01")
+        )
+
+    def test_endpoint_without_api_version(self):
+        self.assertEqual(
+            app._parse_azure_endpoint("https://cliniq.openai.azure.com/openai/deployments/gpt-4o-mini/"),
+            ("https://cliniq.openai.azure.com", "gpt-4o-mini", None)
+        )
+
+    def test_endpoint_without_deployment(self):
+        with self.assertRaises(ValueError):
+            app._parse_azure_endpoint("https://cliniq.openai.azure.com/openai/")
+
+
+class TestCachedLabResult(unittest.TestCase):
+
+    def setUp(self):
+        cache, lock = app.get_response_cache()
+        with lock:
+            cache.clear()
+
+    def test_bucketed_vitals_and_age_share_an_entry(self):
+        app.store_cached_lab_result(make_patient_data(), LAB_RESULT)
+
+        # Gleiche Altersklasse und Raster wie der gespeicherte Fall
+        same_bucket = make_patient_data(age=54, heart_rate=97, temperature=38.41, systolic_bp=141)
+        self.assertEqual(app.find_cached_lab_result(same_bucket), LAB_RESULT)
+
+    def test_clinically_different_vitals_miss(self):
+        app.store_cached_lab_result(make_patient_data(), LAB_RESULT)
+
+        self.assertIsNone(app.find_cached_lab_result(make_patient_data(heart_rate=120)))
+        self.assertIsNone(app.find_cached_lab_result(make_patient_data(temperature=39.4)))
+        self.assertIsNone(app.find_cached_lab_result(make_patient_data(age=57)))
+
+    def test_unparsed_result_is_not_cached(self):
+        app.store_cached_lab_result(make_patient_data(), app.parse_openai_response("kein JSON"))
+        self.assertIsNone(app.find_cached_lab_result(make_patient_data()))
+
+
+class FakeCompletions:
+    """Liefert pro Aufruf die nächste vorbereitete Antwort als Stream von Chunks."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create(self, stream=False, **call_args):
+        self.calls.append(call_args)
+        text = self.responses.pop(0)
+        return [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 8]))])
+            for i in range(0, len(text), 8)
+        ]
+
+
+class TestStreamLabResult(unittest.TestCase):
+
+    def stream(self, responses):
+        completions = FakeCompletions(responses)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        call_args = {"model": "gpt-4o", "messages": app.build_lab_messages("Fall")}
+        return app.stream_lab_result(client, call_args, "Fall"), completions.calls
+
+    def test_valid_answer_is_not_retried(self):
+        lab_result, calls = self.stream([orjson.dumps(LAB_RESULT).decode()])
+
+        self.assertEqual(lab_result["laboratory_values"], LAB_RESULT["laboratory_values"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["messages"][0]["content"], app.SHORT_INSTRUCTION)
+
+    def test_unusable_answer_is_retried_with_the_full_instruction(self):
+        lab_result, calls = self.stream(['{"reasoning": "abgebroch', orjson.dumps(LAB_RESULT).decode()])
+
+        self.assertEqual(lab_result["laboratory_values"], LAB_RESULT["laboratory_values"])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1]["messages"][0]["content"], app.FULL_INSTRUCTION)
+        self.assertEqual(calls[1]["messages"][1], calls[0]["messages"][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
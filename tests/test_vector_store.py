@@ -0,0 +1,193 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from my_package.database import CliniqDatabase
+from my_package.vector_store import CliniqVectorStore
+
+
+def make_case(age, diagnosis="Pneumonie", heart_rate=80, temperature=37.0):
+    return {
+        "patient_data": {"age": age, "gender": "Männlich (m)", "mts_category": "orange"},
+        "clinical_data": {
+            "suspected_diagnosis": diagnosis,
+            "comorbidities": ["COPD/Asthma"],
+            "symptom_duration": "1-3 Tage",
+            "pain_scale": 4,
+            "additional_notes": "",
+        },
+        "vital_signs": {
+            "blood_pressure": "120/80",
+            "systolic_bp": 120,
+            "diastolic_bp": 80,
+            "heart_rate": heart_rate,
+            "temperature": temperature,
+            "respiratory_rate": 16,
+            "oxygen_saturation": 97,
+        },
+    }
+
+
+LAB_RESULT = {"laboratory_values": ["CRP", "Leukozyten"], "reasoning": "Test", "cost_efficiency": 4,
+              "urgency_level": "hoch"}
+
+
+def stored_matrix(db_path):
+    """Normalized embedding BLOBs straight from SQLite, in insertion order."""
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT embedding_vector FROM embeddings WHERE content_type = 'order' ORDER BY id"
+        ).fetchall()
+    matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for (blob,) in rows])
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+class VectorStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "cliniq.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, n_cases, age_offset=0):
+        db = CliniqDatabase(self.db_path)
+        store = CliniqVectorStore(self.db_path)
+        items = []
+        for i in range(n_cases):
+            case = make_case(20 + age_offset + i * 3, heart_rate=60 + i * 4)
+            items.append((db.save_laboratory_order(case, LAB_RESULT, "test"), case, LAB_RESULT))
+        store.save_embeddings_bulk(items)
+        db.close()
+        return store
+
+
+class TestSaveEmbeddingsBulk(VectorStoreTestCase):
+
+    def test_failed_batch_is_rolled_back(self):
+        CliniqDatabase(self.db_path).close()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TRIGGER reject_order BEFORE INSERT ON embeddings WHEN NEW.content_id = 999
+                BEGIN SELECT RAISE(ABORT, 'rejected'); END
+            """)
+        store = CliniqVectorStore(self.db_path)
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            store.save_embeddings_bulk([(1, make_case(30), LAB_RESULT), (999, make_case(40), LAB_RESULT)])
+
+        # Die Verbindung ist wieder frei für den nächsten Schreibvorgang
+        store.save_embedding(2, make_case(50), LAB_RESULT)
+        store.close()
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual([row[0] for row in conn.execute("SELECT content_id FROM embeddings")], [2])
+
+    def test_failed_commit_leaves_the_shared_connection_usable(self):
+        CliniqDatabase(self.db_path).close()
+        with sqlite3.connect(self.db_path) as conn:
+            # Verwaiste Zeile mit verzögertem Fremdschlüssel: erst COMMIT schlägt fehl
+            conn.executescript("""
+                CREATE TABLE parent (id INTEGER PRIMARY KEY);
+                CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED);
+                CREATE TRIGGER orphan AFTER INSERT ON embeddings WHEN NEW.content_id = 999
+                BEGIN INSERT INTO child VALUES (NEW.content_id); END;
+            """)
+        store = CliniqVectorStore(self.db_path)
+        with store._connection() as conn:
+            conn.execute("PRAGMA foreign_keys=ON")
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            store.save_embedding(999, make_case(40), LAB_RESULT)
+
+        with store._connection() as conn:
+            self.assertFalse(conn.in_transaction)
+        store.save_embedding(2, make_case(50), LAB_RESULT)
+        store.close()
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual([row[0] for row in conn.execute("SELECT content_id FROM embeddings")], [2])
+
+
+class TestSimilarCases(VectorStoreTestCase):
+
+    def test_similar_cases_match_brute_force(self):
+        store = self.build(12)
+        query = store.create_case_embedding(make_case(41, heart_rate=90), LAB_RESULT)
+
+        result = store.get_similar_cases_vector(query, k=4)
+        store.close()
+
+        with sqlite3.connect(self.db_path) as conn:
+            content_ids = [row[0] for row in conn.execute(
+                "SELECT content_id FROM embeddings WHERE content_type = 'order' ORDER BY id"
+            )]
+        scores = stored_matrix(self.db_path) @ (query / np.linalg.norm(query))
+        expected = np.argsort(-scores)[:4]
+        self.assertEqual([case_id for case_id, _ in result], [content_ids[row] for row in expected])
+        np.testing.assert_allclose([score for _, score in result], scores[expected], atol=1e-5)
+
+
+class TestEmbeddingMatrixFile(VectorStoreTestCase):
+
+    def test_new_embeddings_are_appended_to_the_matrix_file(self):
+        store = self.build(6)
+        ids, _, epoch = store._load_embedding_matrix(50)
+        matrix_path, ids_path = store._matrix_file_paths(50)
+        size = os.path.getsize(matrix_path)
+
+        db = CliniqDatabase(self.db_path)
+        case = make_case(77, diagnosis="Sepsis", heart_rate=120, temperature=39.2)
+        order_id = db.save_laboratory_order(case, LAB_RESULT, "test")
+        db.close()
+        store.save_embedding(order_id, case, LAB_RESULT)
+
+        new_ids, matrix, new_epoch = store._load_embedding_matrix(50)
+        self.assertEqual(new_epoch, epoch)
+        self.assertEqual(list(new_ids), list(ids) + [order_id])
+        self.assertEqual(os.path.getsize(matrix_path), size + 50 * 4)
+        np.testing.assert_allclose(np.asarray(matrix), stored_matrix(self.db_path), atol=1e-6)
+
+        # Eine frische Instanz liest die angehängte Datei ohne Neuaufbau
+        with sqlite3.connect(self.db_path) as conn:
+            database_id = CliniqVectorStore._database_id(conn.cursor())
+        reopened = CliniqVectorStore(self.db_path)._read_matrix_file(50, database_id)
+        self.assertEqual(list(reopened[1]), list(new_ids))
+        store.close()
+
+    def test_matrix_file_is_rebuilt_after_a_deletion(self):
+        store = self.build(6)
+        ids, _, epoch = store._load_embedding_matrix(50)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM embeddings WHERE content_id = ?", (int(ids[2]),))
+
+        new_ids, matrix, new_epoch = store._load_embedding_matrix(50)
+        self.assertNotEqual(new_epoch, epoch)
+        self.assertEqual(list(new_ids), [int(i) for i in ids if i != ids[2]])
+        np.testing.assert_allclose(np.asarray(matrix), stored_matrix(self.db_path), atol=1e-6)
+
+        query = store.create_case_embedding(make_case(26, heart_rate=68), LAB_RESULT)
+        self.assertNotIn(int(ids[2]), [case_id for case_id, _ in store.get_similar_cases_vector(query, k=6)])
+        store.close()
+
+    def test_matrix_file_is_rebuilt_for_a_reset_database(self):
+        store = self.build(5)
+        store.get_similar_cases_vector(store.create_case_embedding(make_case(30), LAB_RESULT), k=3)
+        store.close()
+
+        # Datenbank zurücksetzen; die Matrix-Dateien der alten Datenbank bleiben liegen
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+        self.build(8, age_offset=17).close()
+
+        ids, matrix, _ = CliniqVectorStore(self.db_path)._load_embedding_matrix(50)
+        self.assertEqual(len(ids), 8)
+        np.testing.assert_allclose(np.asarray(matrix), stored_matrix(self.db_path), atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()